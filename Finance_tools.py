@@ -1,6 +1,10 @@
 import streamlit as st
 import pandas as pd
 import requests
+from utils import start_warmup_scheduler
+
+# Keeps popular tickers warm in the background, once per process
+start_warmup_scheduler()
 
 st.title("Finance tools")
 
@@ -19,6 +23,7 @@ st.write("""
 st.write("""
 ## Available pages:
 - <a href='Dividends' target='_self'>Dividends</a>: Current and historical diviend yields of stocks.
+- <a href='Dividend_Screener' target='_self'>Dividend Screener</a>: Current dividend yields of the whole stock universe compared to their history.
 - <a href='Total_Return' target='_self'>Total Return</a>: Visualize price and total returns, drawdown of stocks.
 """, unsafe_allow_html=True)
 
@@ -0,0 +1,166 @@
+"""
+Offline benchmarks of the dividend and total return pipelines.
+
+Every fixture (see benchmarks/fixtures.py) is written to a temporary history
+store, so the pipelines run end to end without any network access. Each
+stage is timed over several runs and its peak memory measured with
+tracemalloc. Import times are measured in fresh interpreters.
+
+Usage, from the repository root:
+
+    python -m benchmarks.bench
+    python -m benchmarks.bench --output results.jsonl   # append the results
+    python -m benchmarks.bench --baseline results.jsonl # compare with the last recorded run
+"""
+import argparse
+import atexit
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import pandas as pd
+
+# The history store of utils is created at import time
+os.environ['FINANCE_TOOLS_CACHE_DIR'] = tempfile.mkdtemp(prefix='finance-tools-bench-')
+atexit.register(shutil.rmtree, os.environ['FINANCE_TOOLS_CACHE_DIR'], ignore_errors=True)
+warnings.simplefilter('ignore')
+
+import utils
+from benchmarks.fixtures import load_fixtures
+
+def measure(function, repeat: int) -> dict:
+    """
+    Returns the median and best run times in ms of a function called without
+    arguments, and its peak traced memory in MiB.
+    """
+    function()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'MedianMs': statistics.median(times),
+        'BestMs': min(times),
+        'PeakMiB': peak / 2 ** 20,
+    }
+
+def import_time(statement: str, repeat: int) -> dict:
+    """
+    Returns the median and best times in ms of a statement run in fresh
+    interpreters, after importing Streamlit as the app server does, e.g.
+    'import utils'.
+    """
+    code = f"import streamlit, time; start = time.perf_counter(); {statement}; print((time.perf_counter() - start) * 1000)"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    times = [
+        float(subprocess.run(
+            [sys.executable, '-c', code], capture_output=True, text=True, check=True, cwd=root
+        ).stdout.split()[-1])
+        for _ in range(repeat)
+    ]
+    return {'MedianMs': statistics.median(times), 'BestMs': min(times), 'PeakMiB': None}
+
+def dividend_chart(ticker: str, period: str) -> None:
+    # Chart data memoized by Streamlit is recomputed, yield bands come from the store
+    utils.compute_dividend_chart_data.clear()
+    for chart in utils.generate_dividend_chart(ticker, period):
+        chart.to_dict()
+
+def stages(fixtures: dict[str, pd.DataFrame]):
+    """
+    Yields (fixture, stage, bars, function) of everything benchmarked.
+    """
+    for name, history in fixtures.items():
+        bars = len(history)
+        yield name, 'process_dividend_history', bars, lambda history=history: utils.process_dividend_history(history)
+        yield name, 'compute_yield_bands', bars, lambda history=history: utils.compute_yield_bands(history)
+        yield name, 'dividend_chart', bars, lambda name=name: dividend_chart(name, 'max')
+
+    tickers = list(fixtures)
+    panel, _ = utils.load_many(tickers, 'max')
+    returns = utils.compute_returns(panel)
+    yield 'all', 'load_many', len(panel), lambda: utils.load_many(tickers, 'max')
+    yield 'all', 'compute_returns', len(panel), lambda: utils.compute_returns(panel)
+    yield 'all', 'summarize_returns', len(panel), lambda: utils.summarize_returns(returns)
+    for name in tickers:
+        total_return = returns[name].TotalReturn.dropna()
+        yield name, 'rolling_returns_5y', len(total_return), lambda prices=total_return: utils.rolling_returns(prices, 5)
+        yield name, 'drawdown_episodes', len(total_return), lambda prices=total_return: utils.drawdown_episodes(prices)
+
+def revision() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(__file__)
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def run(repeat: int, only: str | None = None) -> pd.DataFrame:
+    fixtures = load_fixtures()
+    utils.history_cache.fetcher = None
+    for name, history in fixtures.items():
+        utils.history_cache.put(name, 'max', history)
+
+    rows = []
+    for stage, statement in [('import_utils', 'import utils'), ('import_utils_altair', 'import utils; utils.setup_altair()')]:
+        if not only or only in stage:
+            rows.append({'Fixture': 'cold', 'Stage': stage, 'Bars': 0, **import_time(statement, repeat)})
+    for fixture, stage, bars, function in stages(fixtures):
+        if only and only not in stage:
+            continue
+        rows.append({'Fixture': fixture, 'Stage': stage, 'Bars': bars, **measure(function, repeat)})
+    return pd.DataFrame(rows)
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per stage')
+    parser.add_argument('--stage', help='only run stages whose name contains this text')
+    parser.add_argument('--output', help='JSON lines file the results are appended to')
+    parser.add_argument('--baseline', help='JSON lines file of results to compare with')
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat, args.stage)
+    table = results.set_index(['Stage', 'Fixture'])
+
+    if args.baseline:
+        baseline = pd.read_json(args.baseline, lines=True)
+        baseline = baseline[baseline.Revision == baseline.Revision.iloc[-1]]
+        print(f"Baseline: {baseline.Revision.iloc[-1]} ({baseline.Date.iloc[-1]})")
+        baseline = baseline.set_index(['Stage', 'Fixture'])
+        table['Speedup'] = baseline.MedianMs / table.MedianMs
+        table['MemoryRatio'] = table.PeakMiB / baseline.PeakMiB
+
+    with pd.option_context('display.float_format', '{:,.2f}'.format, 'display.width', 200):
+        print(table.sort_index().to_string())
+
+    if args.output:
+        results = results.assign(
+            Revision=revision(),
+            Date=datetime.datetime.now().isoformat(timespec='seconds'),
+            Python=platform.python_version(),
+            Pandas=pd.__version__,
+        )
+        with open(args.output, 'a') as file:
+            for record in results.to_dict(orient='records'):
+                file.write(json.dumps(record) + '\n')
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,125 @@
+"""
+Price histories used by the benchmarks, shaped like `fetch_ticker_history`
+results: OHLC, Adj Close, Volume, Dividends and Stock Splits indexed by a
+tz-aware Date.
+
+Synthetic histories are generated from a fixed seed, so every run times the
+same data. Real histories can be recorded once with
+`python -m benchmarks.fixtures TICKER...` and are then loaded from
+benchmarks/fixtures/ next to the synthetic ones.
+"""
+import glob
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+# Dividend payments per year
+FREQUENCIES = {'monthly': 12, 'quarterly': 4, 'semiannual': 2, 'annual': 1}
+
+SYNTHETIC_FIXTURES = {
+    'quarterly_1y': dict(years=1, frequency='quarterly'),
+    'monthly_5y': dict(years=5, frequency='monthly', seed=1),
+    'quarterly_20y': dict(years=20, frequency='quarterly', seed=2, split=True),
+    'annual_20y': dict(years=20, frequency='annual', seed=3),
+    'irregular_30y': dict(years=30, frequency='semiannual', seed=4, specials=8),
+    'quarterly_60y': dict(years=60, frequency='quarterly', seed=5, split=True, specials=3),
+}
+
+def synthetic_history(
+    years: float,
+    frequency: str = 'quarterly',
+    seed: int = 0,
+    specials: int = 0,
+    split: bool = False,
+    end: str = '2024-06-28',
+) -> pd.DataFrame:
+    """
+    Returns a random walk stock history paying a growing dividend.
+
+    Parameters:
+    ----------
+    - years: float
+        Length of the history, 252 trading days per year
+    - frequency: str
+        Regular dividend frequency, see FREQUENCIES
+    - seed: int
+        Seed of the random generator
+    - specials: int
+        Number of special dividends paid at random dates
+    - split: bool
+        Record a 2:1 stock split in the middle of the history
+    - end: str
+        Last date of the history
+
+    Returns:
+    -------
+    - pd.DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=end, periods=int(years * 252 * 1.02), tz='America/New_York', name='Date')
+    # Market holidays
+    dates = dates[rng.random(len(dates)) > 0.02]
+    n = len(dates)
+
+    close = 40 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, n)))
+    spread = np.abs(rng.normal(0, 0.006, n))
+    history = pd.DataFrame({
+        'Open': close * (1 + rng.normal(0, 0.004, n)),
+        'High': close * (1 + spread),
+        'Low': close * (1 - spread),
+        'Close': close,
+        'Volume': rng.integers(100_000, 5_000_000, n),
+        'Dividends': 0.0,
+        'Stock Splits': 0.0,
+    }, index=dates)
+
+    # Regular dividends yield about 3% and grow with the price
+    step = max(n // max(int(years * FREQUENCIES[frequency]), 1), 1)
+    paid = np.arange(rng.integers(1, step + 1), n, step)
+    yearly = 0.03 * pd.Series(close).rolling(252, min_periods=1).mean().to_numpy()
+    dividends = np.zeros(n)
+    dividends[paid] = np.round(yearly[paid] / FREQUENCIES[frequency], 4)
+    if specials:
+        special = rng.choice(np.arange(1, n), size=min(specials, n - 1), replace=False)
+        dividends[special] += np.round(yearly[special] * rng.uniform(0.2, 1.0, len(special)), 4)
+    history['Dividends'] = dividends
+    if split:
+        history.iloc[n // 2, history.columns.get_loc('Stock Splits')] = 2.0
+
+    # Adjusted close: prices before each ex-date scaled down by the dividend
+    factors = np.ones(n)
+    ex = np.flatnonzero(dividends[1:]) + 1
+    factors[ex - 1] = 1 - dividends[ex] / close[ex - 1]
+    history.insert(4, 'Adj Close', close * np.cumprod(factors[::-1])[::-1])
+    return history
+
+def record(tickers: list[str]) -> None:
+    """
+    Downloads the full history of tickers to benchmarks/fixtures/.
+    """
+    from utils import fetch_ticker_history
+
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for ticker in tickers:
+        history = fetch_ticker_history(ticker, 'max')
+        if history.empty:
+            print(f"No data found for {ticker}", file=sys.stderr)
+            continue
+        history.to_parquet(os.path.join(FIXTURES_DIR, f"{ticker.upper()}.parquet"))
+        print(f"{ticker.upper()}: {len(history)} bars")
+
+def load_fixtures() -> dict[str, pd.DataFrame]:
+    """
+    Returns the synthetic histories and the recorded ones, by name.
+    """
+    fixtures = {name: synthetic_history(**params) for name, params in SYNTHETIC_FIXTURES.items()}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.parquet'))):
+        fixtures[os.path.splitext(os.path.basename(path))[0]] = pd.read_parquet(path)
+    return fixtures
+
+if __name__ == '__main__':
+    record(sys.argv[1:])
@@ -1,34 +1,75 @@
 import streamlit as st
-import pandas as pd
 import extra_streamlit_components as stx
 import altair as alt
+import datetime
+import uuid
+from utils import LookThrough, TickerIndex, exposure_breakdown, load_holdings, portfolio_store, setup_altair
 
 st.set_page_config(layout="wide")
+setup_altair()
 
 # Handling of cookies
 @st.cache(allow_output_mutation=True)
 def get_manager():
     return stx.CookieManager()
 
+# Portfolios are stored server-side, the cookie only identifies the browser
 cookie_manager = get_manager()
 cookies = cookie_manager.get_all()
-if not (existing_portfolios := cookie_manager.get(cookie='portfolios')):
-  existing_portfolios = {}
+owner = cookie_manager.get(cookie='portfolio_owner')
+if not owner:
+  owner = st.session_state.setdefault('portfolio_owner', uuid.uuid4().hex)
+
+def remember_owner():
+  if not cookie_manager.get(cookie='portfolio_owner'):
+    expires_at = datetime.datetime.now() + datetime.timedelta(days=365)
+    cookie_manager.set('portfolio_owner', owner, expires_at=expires_at, key='set_portfolio_owner')
+
+# Portfolios saved in the cookie itself by earlier versions of the page. The
+# cookie is kept: it imports them again if the store is lost, e.g. when it is
+# not on persistent storage and the container restarts
+legacy_portfolios = cookie_manager.get(cookie='portfolios') or {}
+if legacy_portfolios:
+  imported = portfolio_store.names(owner)
+  for name, legacy_portfolio in legacy_portfolios.items():
+    if name not in imported:
+      portfolio_store.save(owner, name, legacy_portfolio)
+  remember_owner()
+
+existing_portfolios = portfolio_store.names(owner)
 
 st.title("Aggregate portfolio of ETFs and stocks")
 
 # Load ETFs
-etfs = pd.read_csv('data/blackrock_fr.csv')
+etfs = load_holdings('data/blackrock_fr.csv')
 # Load Stocks
-stocks = pd.read_csv('data/individual_positions.csv')
+stocks = load_holdings('data/individual_positions.csv')
+
+# Holdings matrix of every fund and stock, built once per process
+@st.cache_resource
+def get_look_through():
+  return LookThrough(etfs, stocks)
+
+# Search index of the stock names, built once per process
+@st.cache_resource
+def get_stock_index():
+  return TickerIndex(stocks.drop_duplicates(subset='Name'))
 
 use_saved_portfolio = st.checkbox('Use saved portfolio')
 
 if use_saved_portfolio and (len(existing_portfolios) > 0):
-  selected_portfolio_name = st.selectbox('Select portfolio', existing_portfolios.keys(), disabled=not use_saved_portfolio)
+  selected_portfolio_name = st.selectbox('Select portfolio', existing_portfolios, disabled=not use_saved_portfolio)
+  versions = portfolio_store.versions(owner, selected_portfolio_name)
+  selected_version = st.selectbox(
+    'Version',
+    versions.Version,
+    format_func=lambda version: '{SavedAt:%Y-%m-%d %H:%M} ({Value:,.0f})'.format(**versions.set_index('Version').loc[version])
+  )
   portfolio_name = st.text_input('Portfolio name', value=selected_portfolio_name)
-  portfolio = existing_portfolios[selected_portfolio_name] 
+  saved_portfolio = portfolio_store.load(owner, selected_portfolio_name, selected_version)
+  portfolio = {key: dict(positions) for key, positions in saved_portfolio.items()}
 else:
+  saved_portfolio = None
   portfolio_name = st.text_input('Portfolio name')
   portfolio = {
     'etf_holdings': {},
@@ -50,7 +91,7 @@ with st.expander(f"ETF holdings"):
   }
 
   for etf in etf_choices:
-    default_value = portfolio['etf_holdings'][etf] if etf in portfolio['etf_holdings'] else 0
+    default_value = int(portfolio['etf_holdings'][etf]) if etf in portfolio['etf_holdings'] else 0
     portfolio['etf_holdings'][etf] = st.number_input(
       f'Total value of {etf} holding',
       min_value=0,
@@ -60,11 +101,18 @@ with st.expander(f"ETF holdings"):
 
 # Portfolio stocks
 with st.expander(f"Stock holdings"):
+  # Only the current choices and the search matches are sent to the browser
+  saved_name = f"{selected_portfolio_name}_{selected_version}" if saved_portfolio else ''
+  choices_key = f"stock_choices_{saved_name}"
+  selected = st.session_state.get(choices_key, list(portfolio['stock_holdings']))
+  query = st.text_input('Search stocks', placeholder='Name or ticker')
+  matches = get_stock_index().search(query).Name.tolist()
   stock_choices = st.multiselect(
     "Select stocks",
-    options=stocks.Name.unique(),
-    default=portfolio['stock_holdings'] if portfolio['stock_holdings'] else None
+    options=list(dict.fromkeys([*selected, *matches])),
+    default=selected if selected else None
   )
+  st.session_state[choices_key] = stock_choices
 
   portfolio['stock_holdings'] = {
     stock: portfolio['stock_holdings'][stock]
@@ -73,7 +121,7 @@ with st.expander(f"Stock holdings"):
   }
 
   for stock in stock_choices:
-    default_value = portfolio['stock_holdings'][stock] if stock in portfolio['stock_holdings'] else 0
+    default_value = int(portfolio['stock_holdings'][stock]) if stock in portfolio['stock_holdings'] else 0
     portfolio['stock_holdings'][stock] = st.number_input(
       f'Total value of {stock} holding',
       min_value=0,
@@ -93,26 +141,17 @@ with col3:
 
 if clicked:
   try:
-    etf_holdings = etfs[etfs.Fund.isin(etf_choices)].copy()
-    for etf, holding in portfolio['etf_holdings'].items():
-      # st.text(f'{etf}: {holding}€')
-      etf_holdings.loc[etf_holdings.Fund == etf, 'Value'] = etf_holdings.loc[etf_holdings.Fund == etf, 'Weight (%)'] * holding / 100
-      
-    stock_holdings = stocks[stocks.Name.isin(stock_choices)].copy()
-    for stock, holding in portfolio['stock_holdings'].items():
-      # st.text(f'{stock}: {holding}€')
-      stock_holdings.loc[stock_holdings.Name == stock, 'Value'] = holding
-    
-    holdings = pd.concat([etf_holdings, stock_holdings])
-    holdings = holdings.drop(columns=['Fund'])
-    holdings = holdings.groupby(['Ticker', 'Name', 'Sector', 'Asset Class', 'Location'], as_index=False).Value.sum()
-    holdings['Weight (%)'] = holdings.Value.div(holdings.Value.sum()) * 100                              
+    # Exposure stored with the snapshot, unless positions were edited since
+    holdings = None
+    if portfolio == saved_portfolio:
+      holdings = portfolio_store.exposure(owner, selected_portfolio_name, selected_version)
+    if holdings is None:
+      holdings = get_look_through().exposure(portfolio['etf_holdings'], portfolio['stock_holdings'])
     holdings['Weight (%)'] = holdings['Weight (%)'].round(2)
-    holdings = holdings.sort_values(by='Value', ascending=False)
     
-    sectors = holdings.groupby('Sector')[['Value', 'Weight (%)']].sum()
-    regions = holdings.groupby('Location')[['Value', 'Weight (%)']].sum()
-    asset_classes = holdings.groupby('Asset Class')[['Value', 'Weight (%)']].sum()
+    sectors = exposure_breakdown(holdings, 'Sector')
+    regions = exposure_breakdown(holdings, 'Location')
+    asset_classes = exposure_breakdown(holdings, 'Asset Class')
 
     col1, col2, col3 = st.columns(3)
     col1.metric(
@@ -162,10 +201,20 @@ if clicked:
     st.error('No position found in portfolio')
 
 if saved:
-  existing_portfolios[portfolio_name] = portfolio
-  cookie_manager.set('portfolios', existing_portfolios, key='existing_portfolios')
+  exposure = get_look_through().exposure(portfolio['etf_holdings'], portfolio['stock_holdings'])
+  portfolio_store.save(owner, portfolio_name, portfolio, exposure if len(exposure) else None)
+  # Refresh the list of portfolios, unless the owner cookie has to be set first
+  if cookie_manager.get(cookie='portfolio_owner'):
+    st.rerun()
+  remember_owner()
 
 if delete:
-  del(existing_portfolios[portfolio_name])
-  cookie_manager.set('portfolios', existing_portfolios, key='existing_portfolios')
+  portfolio_store.delete(owner, portfolio_name)
+  if portfolio_name in legacy_portfolios:
+    # Not imported again on the next visit, the cookie has to be set before rerunning
+    remaining = {name: legacy_portfolio for name, legacy_portfolio in legacy_portfolios.items() if name != portfolio_name}
+    expires_at = datetime.datetime.now() + datetime.timedelta(days=365)
+    cookie_manager.set('portfolios', remaining, expires_at=expires_at, key='update_legacy_portfolios')
+  else:
+    st.rerun()
     
@@ -1,20 +1,22 @@
 import streamlit as st
-import pandas as pd
 import requests
 import altair as alt
+from utils import load_holdings, setup_altair
+
+setup_altair()
 
 st.title("ETF Composition")
 
-df = pd.read_csv('data/blackrock_fr.csv')
+df = load_holdings('data/blackrock_fr.csv')
 
 choice = st.selectbox("Select a fund", df.Fund.unique())
 
 selected_fund = df[df.Fund == choice].drop(columns=['Fund']).copy()
 selected_fund['Weight (%)'] = selected_fund['Weight (%)'].round(2)
 
-sectors = selected_fund.groupby('Sector')['Weight (%)'].sum()
-regions = selected_fund.groupby('Location')['Weight (%)'].sum()
-asset_classes = selected_fund.groupby('Asset Class')['Weight (%)'].sum()
+sectors = selected_fund.groupby('Sector', observed=True)['Weight (%)'].sum()
+regions = selected_fund.groupby('Location', observed=True)['Weight (%)'].sum()
+asset_classes = selected_fund.groupby('Asset Class', observed=True)['Weight (%)'].sum()
 
 col1, col2, col3 = st.columns(3)
 col1.metric("Top 10 concentration", value=f"{selected_fund.iloc[:10]['Weight (%)'].sum():.0f}%")
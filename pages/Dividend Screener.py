@@ -0,0 +1,61 @@
+import streamlit as st
+from utils import load_css, load_universe, yahoo_holdings, background_downloads, screen_dividend_yields, start_warmup_scheduler
+
+st.set_page_config(layout="wide")
+load_css()
+start_warmup_scheduler()
+
+@st.cache_data(ttl=3600, show_spinner='Scanning stored histories...')
+def scan(period):
+    return screen_dividend_yields(yahoo_holdings(load_universe()).Ticker.tolist(), period)
+
+st.title('Dividend screener')
+st.markdown("""
+    Current dividend yield of every US stock of the universe compared to its own history.
+    Only histories already downloaded are scanned. Other stocks will be screened, and filtered
+    by location, once their tickers are mapped to yahoo finance symbols.
+""")
+
+universe = yahoo_holdings(load_universe())
+col1, col2 = st.columns(2)
+sectors = col1.multiselect("Sector", options=sorted(universe.Sector.dropna().unique()))
+period = col2.selectbox("Period", options=['5y', '10y', 'max'], index=1)
+
+results, missing = scan(period)
+screen = universe.set_index('Ticker')[['Name', 'Sector']].join(results, how='inner')
+if sectors:
+    screen = screen[screen.Sector.isin(sectors)]
+screen = screen.sort_values(by='YieldPercentile', ascending=False)
+
+# Display ratios as percentages
+percent_columns = ['DividendYield', 'YieldPercentile', 'MedianYield', 'UpsideToMedian']
+screen[percent_columns] = screen[percent_columns] * 100
+
+col1, col2 = st.columns(2)
+col1.metric(label='Dividend payers', value=f"{len(screen):,}")
+col2.metric(label='Above their median yield', value=f"{(screen.UpsideToMedian > 0).mean():.0%}" if len(screen) else '-')
+
+st.dataframe(
+    screen,
+    use_container_width=True,
+    column_config={
+        'Close': st.column_config.NumberColumn(format='%.2f'),
+        'DividendYield': st.column_config.NumberColumn('Yield', format='%.2f%%'),
+        'YieldPercentile': st.column_config.NumberColumn('Yield percentile', format='%.0f%%'),
+        'MedianYield': st.column_config.NumberColumn('Median yield', format='%.2f%%'),
+        'UpsideToMedian': st.column_config.NumberColumn('Upside to median', format='%+.0f%%'),
+        'LastDate': st.column_config.DateColumn('Last bar'),
+    }
+)
+
+if missing:
+    st.caption(f"{len(missing):,} tickers of the universe have no stored history yet.")
+    col1, col2 = st.columns(2)
+    if col1.button('Download missing histories'):
+        background_downloads.submit(missing)
+    if col2.button('Scan again', help='Include the histories downloaded since the last scan'):
+        scan.clear()
+        st.rerun()
+    downloading = background_downloads.pending
+    if downloading:
+        st.caption(f"{downloading:,} histories are downloading in the background, scan again to include them.")
@@ -1,64 +1,100 @@
 import streamlit as st
-import yfinance as yf
 import altair as alt
 import pandas as pd
-import numpy as np
-import datetime
-from utils import load_css
+from utils import (
+    load_css, ticker_search, load_many, compute_returns, summarize_returns,
+    rolling_returns, drawdown_episodes, TRADING_DAYS_PER_YEAR,
+    trace_render, trace_stage, trace_note, show_trace, setup_altair, progress_bar,
+    start_warmup_scheduler
+)
 st.set_page_config(layout="wide")
 load_css()
+setup_altair()
+start_warmup_scheduler()
 
-def load_ticker_return(ticker, period):
-    ticker = yf.Ticker(ticker)
-    history = ticker.history(period=period, auto_adjust=False)
-    history['CumulativeShares'] = ((history.Dividends / history.Close) + 1).cumprod()
-    history['PriceReturn'] = history['Close'] / history['Close'].iloc[0] - 1
-    history['TotalReturn'] = history['Adj Close'] / history['Adj Close'].iloc[0] - 1
-    history['PriceDrawdown'] = history['Close'] / history['Close'].cummax() - 1
-    history['TotalDrawdown'] = history['Adj Close'] / history['Adj Close'].cummax() - 1
-    history = history.reset_index()
-    return history
+# Line colors of compared tickers, after the ticker's own total and price lines
+COMPARISON_COLORS = [
+    'white', '#72b7b2', '#eeca3b', '#b279a2', '#54a24b',
+    '#ff9da6', '#9d755d', '#bab0ac', '#4c78a8', '#e45756'
+]
 
 st.title('Total return calculator')
-col1, col2, col3 = st.columns(3)
-ticker = col1.text_input("Ticker", value='MSFT')
+col1, col2, col3, col4 = st.columns(4)
+ticker = ticker_search(col1, "Ticker", value='MSFT')
 period = col2.selectbox("Period", options=[
         '5d', '1mo', '3mo', '6mo', '1y', '2y', '5y', '10y', 'ytd', 'max'
     ],
     index=6
 )
-index = col3.selectbox(label='Index', options=[None, 'SPY', 'QQQ'])
+indexes = col3.multiselect(label='Indexes', options=['SPY', 'QQQ', 'DIA', 'IWM', 'VT', 'EFA', 'AGG'])
+peers = col4.text_input("Peers", placeholder='AAPL, GOOGL')
 
 if ticker:
-    history = load_ticker_return(ticker, period)
+    comparisons = [
+        comparison for comparison in dict.fromkeys([*indexes, *(peer.strip().upper() for peer in peers.split(','))])
+        if comparison and comparison != ticker
+    ]
 
-    if index:
-        history_index = load_ticker_return(index, period)
-        history_index = history_index[['TotalReturn', 'TotalDrawdown']]
-        history_index.columns = ['Index'+col for col in history_index.columns]
-        history = pd.concat([history, history_index], axis=1)
+    # Timings of each stage of the render with ?debug=1
+    with trace_render('total_return', enabled='debug' in st.query_params or None, ticker=ticker, period=period) as trace:
+        # All tickers are downloaded together and aligned by date
+        with trace_stage('load_many', Tickers=len(comparisons) + 1):
+            panel, errors = load_many([ticker, *comparisons], period, progress=progress_bar('Downloading'))
+            trace_note(Rows=len(panel))
+        if ticker in errors:
+            st.error(f'No data found for {ticker}')
+            st.stop()
+        if errors:
+            st.warning(f"No data found for {', '.join(errors)}")
+        comparisons = [comparison for comparison in comparisons if comparison not in errors]
+        # Compared tickers start with the ticker, but keep the dividends of
+        # dates it did not trade, only the returns are kept on its dates
+        traded = panel[ticker, 'Close'].notna()
+        traded = traded.loc[traded.idxmax():]
+        panel = panel.loc[traded.index]
 
-    n_years = (history.iloc[-1].Date - history.iloc[0].Date) / datetime.timedelta(365.2425)
+        with trace_stage('compute_returns', Rows=len(panel)):
+            returns = compute_returns(panel).loc[traded]
+        with trace_stage('summarize_returns'):
+            summary = summarize_returns(returns)
+    history = returns[ticker].reset_index()
+    for comparison in comparisons:
+        history[f'{comparison} TotalReturn'] = returns[comparison, 'TotalReturn'].to_numpy()
+        history[f'{comparison} TotalDrawdown'] = returns[comparison, 'TotalDrawdown'].to_numpy()
+    comparison_colors = [COMPARISON_COLORS[i % len(COMPARISON_COLORS)] for i in range(len(comparisons))]
 
     col1, col2, col3, col4 = st.columns(4)
     col1.metric(
         label=f"{period} price return",
-        value=f"{history.iloc[-1].PriceReturn:+,.0%}"
+        value=f"{summary.loc[ticker, 'PriceReturn']:+,.0%}"
     )
     col2.metric(
         label=f"{period} total return",
-        value=f"{history.iloc[-1].TotalReturn:+,.0%}"
+        value=f"{summary.loc[ticker, 'TotalReturn']:+,.0%}"
     )
-    annualized_return = (1 + history.iloc[-1].TotalReturn) ** (1 / n_years) - 1
     col3.metric(
         label='Annulized total return',
-        value=f"{annualized_return:.1%}"
+        value=f"{summary.loc[ticker, 'CAGR']:.1%}"
     )
     col4.metric(
         label='Share count if reinvestment',
-        value=f"{history.CumulativeShares.iloc[-1] - 1:+.0%}"
+        value=f"{summary.loc[ticker, 'ShareGrowth']:+.0%}"
     )
 
+    if comparisons:
+        columns = ['TotalReturn', 'CAGR', 'MaxDrawdown', 'CurrentDrawdown', 'ShareGrowth']
+        st.dataframe(
+            summary.loc[[ticker, *comparisons], columns] * 100,
+            use_container_width=True,
+            column_config={
+                'TotalReturn': st.column_config.NumberColumn(f'{period} total return', format='%+.0f%%'),
+                'CAGR': st.column_config.NumberColumn('Annualized total return', format='%.1f%%'),
+                'MaxDrawdown': st.column_config.NumberColumn('Max drawdown', format='%+.0f%%'),
+                'CurrentDrawdown': st.column_config.NumberColumn('Current drawdown', format='%+.0f%%'),
+                'ShareGrowth': st.column_config.NumberColumn('Share count if reinvestment', format='%+.0f%%'),
+            }
+        )
+
     returns = pd.melt(
         history,
         id_vars=['Date'],
@@ -97,12 +133,12 @@ if ticker:
                 range=[
                     st.secrets["theme"]['primaryColor'],
                     st.secrets["theme"]['secondaryColor'],
-                    'white'
+                    *comparison_colors
                 ],
                 domain=[
                     'TotalReturn',
                     'PriceReturn',
-                    'IndexTotalReturn'
+                    *[f'{comparison} TotalReturn' for comparison in comparisons]
                 ]
             ),
             legend=alt.Legend(
@@ -145,11 +181,11 @@ if ticker:
     col1, col2 = st.columns(2)
     col1.metric(
         label=f"{period} max drawdown",
-        value=f"{history.TotalDrawdown.min():+,.0%}"
+        value=f"{summary.loc[ticker, 'MaxDrawdown']:+,.0%}"
     )
     col2.metric(
         label=f"Current drawdown",
-        value=f"{history.iloc[-1].TotalDrawdown:+,.0%}"
+        value=f"{summary.loc[ticker, 'CurrentDrawdown']:+,.0%}"
     )
 
     drawdown = pd.melt(
@@ -184,12 +220,12 @@ if ticker:
                 range=[
                     st.secrets["theme"]['primaryColor'],
                     st.secrets["theme"]['secondaryColor'],
-                    'white'
+                    *comparison_colors
                 ],
                 domain=[
                     'TotalDrawdown',
                     'PriceDrawdown',
-                    'IndexTotalDrawdown'
+                    *[f'{comparison} TotalDrawdown' for comparison in comparisons]
                 ]
             ),
             legend=alt.Legend(orient='top')
@@ -206,3 +242,72 @@ if ticker:
     chart = chart.properties(height=400)
 
     st.altair_chart(chart, use_container_width=True)
+
+    st.header('Rolling returns')
+    prices = panel[ticker, 'Adj Close']
+    holding_periods = [years for years in [1, 3, 5, 10, 20] if prices.count() > years * TRADING_DAYS_PER_YEAR]
+    if holding_periods:
+        years = st.selectbox(
+            "Holding period (years)",
+            options=holding_periods,
+            index=min(2, len(holding_periods) - 1)
+        )
+        rolling = rolling_returns(prices, years)
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric(label=f"Worst {years}y annualized return", value=f"{rolling.CAGR.min():.1%}")
+        col2.metric(label=f"Median {years}y annualized return", value=f"{rolling.CAGR.median():.1%}")
+        col3.metric(label=f"Best {years}y annualized return", value=f"{rolling.CAGR.max():.1%}")
+        col4.metric(label=f"Positive {years}y periods", value=f"{(rolling.CAGR > 0).mean():.0%}")
+
+        rolling_chart = alt.Chart(rolling.rename_axis('Date').reset_index()).mark_line(
+            color=st.secrets["theme"]['primaryColor']
+        ).encode(
+            x=alt.X(
+                'Date:T',
+                title=f'Start of the {years}y holding period',
+                axis=alt.Axis(format='%Y', tickCount='year'),
+            ),
+            y=alt.Y(
+                'CAGR:Q',
+                title='Annualized total return',
+                axis=alt.Axis(format='%'),
+            ),
+            tooltip=[
+                alt.Tooltip('Date:T'),
+                alt.Tooltip('CAGR:Q', title='Annualized return', format='.1%'),
+                alt.Tooltip('MaxDrawdown:Q', title='Max drawdown', format='.0%'),
+            ]
+        ).properties(height=300)
+        st.altair_chart(rolling_chart, use_container_width=True)
+    else:
+        st.info('The period is too short for rolling returns.')
+
+    st.header('Drawdowns')
+    episodes = drawdown_episodes(prices)
+    if len(episodes):
+        recovered = episodes[episodes.Recovery.notna()]
+        col1, col2 = st.columns(2)
+        col1.metric(
+            label='Longest recovery',
+            value=f"{recovered.DaysToRecovery.max() / 365.2425:.1f} years" if len(recovered) else '-'
+        )
+        col2.metric(
+            label='Median recovery of 10%+ drawdowns',
+            value=f"{recovered[recovered.Depth <= -0.1].DaysToRecovery.median():.0f} days" if (recovered.Depth <= -0.1).any() else '-'
+        )
+        st.dataframe(
+            episodes.nsmallest(10, 'Depth').assign(Depth=lambda df: df.Depth * 100),
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                'Peak': st.column_config.DateColumn('Peak'),
+                'Trough': st.column_config.DateColumn('Trough'),
+                'Recovery': st.column_config.DateColumn('Recovery'),
+                'Depth': st.column_config.NumberColumn('Depth', format='%.0f%%'),
+                'DaysToTrough': st.column_config.NumberColumn('Days to trough'),
+                'DaysToRecovery': st.column_config.NumberColumn('Days to recovery'),
+            }
+        )
+
+    show_trace(trace)
@@ -0,0 +1,74 @@
+"""
+DividendModel against process_dividend_history, on synthetic histories.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils
+from benchmarks.fixtures import SYNTHETIC_FIXTURES, synthetic_history
+
+@pytest.fixture(scope='module', params=list(SYNTHETIC_FIXTURES))
+def history(request):
+    return synthetic_history(**SYNTHETIC_FIXTURES[request.param])
+
+def test_built_at_once(history):
+    model = utils.DividendModel(history)
+    pd.testing.assert_frame_equal(model.frame, utils.process_dividend_history(history))
+
+@pytest.mark.parametrize('seed', range(3))
+def test_updated_from_random_prefixes(history, seed):
+    rng = np.random.default_rng(seed)
+    cuts = [*np.sort(rng.choice(np.arange(1, len(history)), size=min(8, len(history) - 1), replace=False)), len(history)]
+    model = utils.DividendModel()
+    for cut in cuts:
+        # As refreshed by the history store: the whole history so far
+        model.update(history.iloc[:cut])
+        pd.testing.assert_frame_equal(model.frame, utils.process_dividend_history(history.iloc[:cut]))
+
+def test_distributions_must_be_added_in_order():
+    history = synthetic_history(5, 'quarterly')
+    model = utils.DividendModel(history)
+    with pytest.raises(ValueError):
+        model.add([history.index[0]], [1.0])
+
+def test_extends_longer_history():
+    history = synthetic_history(20, 'quarterly', seed=2)
+    model = utils.DividendModel(history.iloc[:-60])
+    assert model.extends(history)
+    assert model.extends(history.iloc[:-60])
+
+def test_does_not_extend_corrected_dividend():
+    history = synthetic_history(20, 'quarterly', seed=2)
+    model = utils.DividendModel(history.iloc[:-60])
+    corrected = history.copy()
+    paid = corrected.index[:-60][corrected.Dividends.iloc[:-60].to_numpy() > 0]
+    corrected.loc[paid[-1], 'Dividends'] *= 1.1
+    assert not model.extends(corrected)
+
+def test_does_not_extend_split_adjusted_history():
+    history = synthetic_history(20, 'quarterly', seed=2)
+    model = utils.DividendModel(history.iloc[:-60])
+    adjusted = history.copy()
+    adjusted[['Open', 'High', 'Low', 'Close', 'Adj Close', 'Dividends']] /= 2
+    assert not model.extends(adjusted)
+
+def test_does_not_extend_other_history():
+    history = synthetic_history(20, 'quarterly', seed=2)
+    model = utils.DividendModel(history.iloc[:-60])
+    # Different first bar, or last bar seen missing
+    assert not model.extends(history.iloc[1:])
+    assert not model.extends(history.drop(history.index[-61]))
+
+def test_yield_band_store_rebuilds_rewritten_history(tmp_path):
+    history = synthetic_history(20, 'quarterly', seed=2)
+    cache = utils.HistoryCache(str(tmp_path), fetcher=None)
+    store = utils.YieldBandStore(cache)
+
+    cache.put('X', 'max', history.iloc[:-60])
+    store.load('X', 'max')
+    adjusted = history.copy()
+    adjusted[['Open', 'High', 'Low', 'Close', 'Adj Close', 'Dividends']] /= 2
+    cache.put('X', 'max', adjusted)
+
+    pd.testing.assert_frame_equal(store.load('X', 'max'), utils.compute_yield_bands(adjusted))
@@ -0,0 +1,84 @@
+"""
+Incremental refresh of stored histories: merge_history and HistoryCache
+with a stub fetcher.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils
+from benchmarks.fixtures import synthetic_history
+
+def adjusted(history: pd.DataFrame) -> pd.DataFrame:
+    """History as downloaded then: Adj Close from the dividends paid so far."""
+    history = history.copy()
+    close, dividends = history.Close.to_numpy(), history.Dividends.to_numpy()
+    factors = np.ones(len(history))
+    ex = np.flatnonzero(dividends[1:]) + 1
+    factors[ex - 1] = 1 - dividends[ex] / close[ex - 1]
+    history['Adj Close'] = close * np.cumprod(factors[::-1])[::-1]
+    return history
+
+@pytest.fixture
+def history():
+    return synthetic_history(5, 'quarterly', seed=1)
+
+def download(history: pd.DataFrame, end: int, days: int = 10) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Returns the stored history up to `end`, and the bars downloaded since `days` before it."""
+    cached = adjusted(history.iloc[:end])
+    recent = adjusted(history).loc[cached.index[-1] - pd.Timedelta(days=days):]
+    return cached, recent
+
+def test_appends_new_bars(history):
+    cached, recent = download(history, len(history) - 20)
+    pd.testing.assert_frame_equal(utils.merge_history(cached, recent), adjusted(history), check_freq=False)
+
+def test_rescales_adj_close_on_new_ex_dividend(history):
+    ex = np.flatnonzero(history.Dividends.to_numpy())[-1]
+    cached, recent = download(history, ex - 2)
+    merged = utils.merge_history(cached, recent)
+    # Older bars were scaled down by the new dividend
+    assert not np.allclose(cached['Adj Close'].iloc[0], merged['Adj Close'].iloc[0])
+    pd.testing.assert_frame_equal(merged, adjusted(history), check_freq=False, rtol=1e-9)
+
+def test_split_in_new_bars_needs_full_download(history):
+    cached, recent = download(history, len(history) - 20)
+    recent = recent.copy()
+    recent.iloc[-5, recent.columns.get_loc('Stock Splits')] = 2.0
+    assert utils.merge_history(cached, recent) is None
+
+def test_rewritten_close_needs_full_download(history):
+    cached, recent = download(history, len(history) - 20)
+    cached.iloc[-3, cached.columns.get_loc('Close')] *= 1.004
+    assert utils.merge_history(cached, recent) is None
+
+def test_partial_last_bar_is_replaced(history):
+    cached, recent = download(history, len(history) - 20)
+    # Stored during the session, before its close
+    cached.iloc[-1, cached.columns.get_loc('Close')] *= 1.004
+    cached.iloc[-1, cached.columns.get_loc('Adj Close')] *= 1.004
+    pd.testing.assert_frame_equal(utils.merge_history(cached, recent), adjusted(history), check_freq=False)
+
+def test_no_overlap_needs_full_download(history):
+    cached = adjusted(history.iloc[:-20])
+    assert utils.merge_history(cached, adjusted(history).iloc[-10:]) is None
+    # Only the last stored bar, which is not checked
+    assert utils.merge_history(cached, adjusted(history).iloc[len(history) - 21:]) is None
+
+def test_cache_refresh_downloads_new_bars_only(tmp_path, history):
+    calls = []
+    available = {'bars': len(history) - 20}
+
+    def fetcher(ticker, period, start=None):
+        calls.append(start)
+        bars = adjusted(history.iloc[:available['bars']])
+        return bars if start is None else bars.loc[start:]
+
+    cache = utils.HistoryCache(str(tmp_path), fetcher=fetcher)
+    cache.load('X', 'max')
+    available['bars'] = len(history)
+    refreshed = cache.update('X')
+
+    assert calls[0] is None and calls[1] is not None
+    assert len(calls) == 2
+    pd.testing.assert_frame_equal(refreshed, adjusted(history), check_freq=False)
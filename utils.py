@@ -1,10 +1,26 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 import numpy as np
-import altair as alt
-import seaborn as sns
+import contextvars
 import datetime
+import functools
+import io
+import json
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+import time
+import zoneinfo
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice, repeat
+from typing import NamedTuple
+from streamlit.logger import get_logger
 
 def load_css():
     return st.markdown(
@@ -126,115 +142,2004 @@ def streamlit_theme():
     }
     return config
 
-alt.themes.register("test", streamlit_theme)
-alt.themes.enable("test")
-alt.data_transformers.disable_max_rows()
+@functools.cache
+def setup_altair():
+    """
+    Imports altair and enables the app theme, once per process. Altair is
+    only needed by pages drawing charts, it is not imported with utils.
+
+    Returns:
+    -------
+    - the altair module
+    """
+    import altair as alt
+
+    alt.themes.register("test", streamlit_theme)
+    alt.themes.enable("test")
+    alt.data_transformers.disable_max_rows()
+    return alt
+
+# sns.color_palette("vlag_r", 10).as_hex(), one color per yield decile band
+YIELD_BAND_PALETTE = [
+    '#b95b5a', '#c87e7b', '#d7a09d', '#e6c5c3', '#f7eae8',
+    '#efeef1', '#cad0dd', '#a3b4cd', '#7e9ac2', '#5782bc'
+]
+
+# Local price-history store
+HISTORY_CACHE_DIR = os.environ.get('FINANCE_TOOLS_CACHE_DIR', os.path.join('.cache', 'history'))
+HISTORY_CACHE_TTL = datetime.timedelta(hours=float(os.environ.get('FINANCE_TOOLS_CACHE_TTL_HOURS', 12)))
+HISTORY_CACHE_MAX_ENTRIES = int(os.environ.get('FINANCE_TOOLS_CACHE_MAX_ENTRIES', 2000))
+HISTORY_CACHE_IDLE_EXPIRY = datetime.timedelta(days=30)
+# Histories kept in memory on top of the Parquet files
+HISTORY_MEMORY_ENTRIES = 64
+# Dividend models kept in memory by the yield band store
+DIVIDEND_MODEL_ENTRIES = 256
+# Bars re-downloaded before the last stored one to pick up late corrections
+HISTORY_REFRESH_OVERLAP = datetime.timedelta(days=10)
+# Concurrent downloads in load_many, and seconds allowed per ticker
+BATCH_MAX_WORKERS = 8
+BATCH_TIMEOUT = 30
+# Download threads shared by all sessions, and seconds between progress updates
+DATA_MAX_WORKERS = 32
+LOAD_POLL_INTERVAL = 0.25
+# Requests per second sent to each data host by the whole process, and burst size
+HOST_RATE_LIMIT = float(os.environ.get('FINANCE_TOOLS_RATE_LIMIT', 4))
+HOST_RATE_BURST = 8
+YAHOO_HOST = 'query2.finance.yahoo.com'
+# Tickers handled by each worker process of the screener, and number of workers
+SCREENER_CHUNK_SIZE = 250
+SCREENER_MAX_WORKERS = os.cpu_count()
+# Tickers loaded at a time by `BackgroundDownloads`
+BACKGROUND_CHUNK_SIZE = 50
+UNIVERSE_PATH = os.path.join('data', 'individual_positions.csv')
+# Universe locations whose tickers are yahoo finance symbols, others lack the exchange suffix
+YAHOO_LOCATIONS = ['Etats-Unis']
+# Low cardinality holdings columns stored as categoricals
+HOLDINGS_CATEGORY_COLUMNS = ['Fund', 'Sector', 'Location', 'Asset Class']
+# Matches offered by the ticker search boxes
+TICKER_SEARCH_LIMIT = 20
+# Dividend chart computations shared across sessions
+CHART_CACHE_TTL = datetime.timedelta(hours=1)
+CHART_CACHE_MAX_ENTRIES = 256
+# Points sent per chart series, about one per pixel of the 1200px wide charts
+CHART_MAX_POINTS = 1200
+# Background refresh of popular tickers, see `WarmupScheduler`
+WARMUP_ENABLED = os.environ.get('FINANCE_TOOLS_WARMUP', '1') not in ('', '0')
+WARMUP_TICKERS = [ticker.strip() for ticker in os.environ.get('FINANCE_TOOLS_WARMUP_TICKERS', '').split(',') if ticker.strip()]
+# Tickers warmed when WARMUP_TICKERS is empty: largest US holdings of the universe
+WARMUP_TOP_HOLDINGS = 100
+# Periods offered by the Dividends page
+WARMUP_PERIODS = ['1y', '2y', '5y', '10y', 'ytd', 'max']
+# After the US close, once Yahoo published the last bar
+WARMUP_TIME = datetime.time(17, 0)
+WARMUP_TIMEZONE = 'America/New_York'
+# Seconds after startup before warming what is missing or stale
+WARMUP_STARTUP_DELAY = 60
+# Saved portfolios, must be on persistent storage: the local disk of a Streamlit
+# Cloud app is wiped when its container restarts or is redeployed
+PORTFOLIO_DB_PATH = os.environ.get('FINANCE_TOOLS_PORTFOLIO_DB', os.path.join('.cache', 'portfolios.sqlite'))
+# Log the stage timings of every render, see `trace_render`
+TRACE_RENDERS = os.environ.get('FINANCE_TOOLS_TRACE', '') not in ('', '0')
+
+logger = get_logger(__name__)
+_current_trace = contextvars.ContextVar('render_trace', default=None)
+
+class RenderTrace:
+    """
+    Stages of one render, see `trace_render`. Each stage is a dict with its
+    Stage name, nesting Depth, wall time in Ms and any noted field (Rows,
+    Bytes, Cache...).
+    """
+    def __init__(self, name: str, **fields):
+        self.name = name
+        self.fields = fields
+        self.stages = []
+        self.open = []
+        self.total_ms = None
+
+    def to_dict(self) -> dict:
+        return {'Render': self.name, **self.fields, 'Ms': self.total_ms, 'Stages': self.stages}
+
+    def to_frame(self) -> pd.DataFrame:
+        frame = pd.DataFrame(self.stages)
+        if not frame.empty:
+            frame['Stage'] = ['\u2003' * depth + stage for stage, depth in zip(frame.Stage, frame.Depth)]
+            frame = frame[['Stage', 'Ms', *frame.columns.drop(['Stage', 'Ms', 'Depth'])]]
+        return frame
+
+@contextmanager
+def trace_render(name: str, enabled: bool | None = None, **fields):
+    """
+    Records the stages (see `trace_stage`) run during a render, and logs them
+    as one JSON line when it ends. Yields the RenderTrace, or None when
+    tracing is disabled, in which case stages cost next to nothing.
+
+    Parameters:
+    ----------
+    - name: str
+        Name of the render, e.g. the page
+    - enabled: bool
+        Trace this render, defaults to TRACE_RENDERS
+    - fields
+        Context logged with the stages, e.g. the ticker
+    """
+    if not (TRACE_RENDERS if enabled is None else enabled):
+        yield None
+        return
+    trace = RenderTrace(name, **fields)
+    token = _current_trace.set(trace)
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace.total_ms = (time.perf_counter() - start) * 1000
+        _current_trace.reset(token)
+        logger.info('render %s', json.dumps(trace.to_dict(), default=str))
+
+@contextmanager
+def trace_stage(name: str, **fields):
+    """
+    Times a stage of the current render, if traced. Stages can be nested.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    stage = {'Stage': name, 'Depth': len(trace.open), **fields}
+    trace.stages.append(stage)
+    trace.open.append(stage)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage['Ms'] = (time.perf_counter() - start) * 1000
+        trace.open.pop()
+
+def trace_note(**fields) -> None:
+    """Adds fields, e.g. Rows or Cache, to the innermost running stage."""
+    trace = _current_trace.get()
+    if trace is not None and trace.open:
+        trace.open[-1].update(fields)
+
+@contextmanager
+def trace_worker(enabled: bool):
+    """
+    Records the stages run by a worker thread for a traced render. Threads
+    do not see the render's trace, the stages are collected apart and handed
+    back to the render's thread, which adds them with `trace_merge`.
+
+    Parameters:
+    ----------
+    - enabled: bool
+        Whether the render is traced, e.g. `trace_enabled()` in its thread
+
+    Yields the list of stages, left empty when not enabled.
+    """
+    if not enabled:
+        yield []
+        return
+    trace = RenderTrace('worker')
+    token = _current_trace.set(trace)
+    try:
+        yield trace.stages
+    finally:
+        _current_trace.reset(token)
+
+def trace_enabled() -> bool:
+    """Whether the current render is traced."""
+    return _current_trace.get() is not None
+
+def trace_merge(stages: list[dict]) -> None:
+    """
+    Adds stages recorded by `trace_worker` to the current render, nested in
+    its innermost running stage.
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        depth = len(trace.open)
+        trace.stages.extend({**stage, 'Depth': stage['Depth'] + depth} for stage in stages)
+
+def show_chart(chart, container=st, **kwargs):
+    """
+    `st.altair_chart`, recorded with the size of the chart spec when the
+    render is traced.
+    """
+    if _current_trace.get() is None:
+        return container.altair_chart(chart, **kwargs)
+    with trace_stage('altair_chart', Bytes=len(chart.to_json())):
+        return container.altair_chart(chart, **kwargs)
+
+def show_trace(trace: RenderTrace | None, container=st) -> None:
+    """Debug panel of the stages of a traced render."""
+    if trace is None:
+        return
+    with container.expander(f"Render timings: {trace.total_ms:,.0f} ms"):
+        st.dataframe(
+            trace.to_frame(),
+            hide_index=True,
+            use_container_width=True,
+            column_config={'Ms': st.column_config.NumberColumn(format='%.1f')}
+        )
+
+class RateLimiter:
+    """
+    Token bucket shared by all threads: `acquire` blocks until a request may
+    be sent, allowing bursts of `burst` requests and `rate` requests per
+    second on average. Callers are served in arrival order.
+
+    Parameters:
+    ----------
+    - rate: float
+        Requests per second
+    - burst: int
+        Requests that can be sent at once after a quiet period
+    """
+    def __init__(self, rate: float = HOST_RATE_LIMIT, burst: int = HOST_RATE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Waits for a token, returns the seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Tokens go negative: later callers wait behind the earlier ones
+            self._tokens -= 1
+            delay = max(-self._tokens / self.rate, 0)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def rate_limiter(host: str) -> RateLimiter:
+    """Returns the process-wide rate limiter of a host."""
+    with _rate_limiters_lock:
+        if host not in _rate_limiters:
+            _rate_limiters[host] = RateLimiter()
+        return _rate_limiters[host]
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time: callers arriving while a call
+    of the same key is running wait for it and share its result, or its
+    exception.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, function, *args, **kwargs) -> tuple:
+        """
+        Returns the result of function(*args, **kwargs), and whether it was
+        shared with a call already running for the key.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = Future()
+                leader = True
+            else:
+                leader = False
+        if not leader:
+            return call.result(), True
+
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+def fetch_ticker_history(ticker: str, period: str = 'max', start: str | None = None) -> pd.DataFrame:
+    """
+    Downloads stock history from yahoo finance, bypassing the local store.
+
+    Parameters:
+    ----------
+    - ticker: str
+        Ticker from yahoo finance
+    - period: str
+        Period to collect data from (ytd, 1wk, 1m, 6m, 1y, 10y, ..., max)
+    - start: str
+        First date to collect (YYYY-MM-DD), takes precedence over period
+
+    Returns:
+    -------
+    - pd.DataFrame containing stock historical data
+    """
+    # yfinance is slow to import, and only needed when the store misses
+    import yfinance as yf
+
+    # Keep the whole process under Yahoo throttling
+    waited = rate_limiter(YAHOO_HOST).acquire()
+    if waited:
+        trace_note(RateLimitWait=waited)
+    if start is not None:
+        return yf.Ticker(ticker).history(
+            start=start,
+            auto_adjust=False
+        )
+    return yf.Ticker(ticker).history(
+        period=period,
+        auto_adjust=False
+    )
+
+def merge_history(cached: pd.DataFrame, recent: pd.DataFrame) -> pd.DataFrame | None:
+    """
+    Appends recently downloaded bars to a stored history.
+
+    Bars of `recent` replace the overlapping stored ones. A dividend going ex
+    rescales the whole 'Adj Close' column: the factor is measured on the
+    overlap and applied to older bars. The last stored bar is left out of the
+    checks, as it may have been stored before the session closed. Returns
+    None when the histories cannot be stitched (no overlap, split, or
+    rewritten closes) and a full download is needed.
+
+    Parameters:
+    ----------
+    - cached: pd.DataFrame
+        Stored history
+    - recent: pd.DataFrame
+        History downloaded from a date before the last stored bar
+
+    Returns:
+    -------
+    - pd.DataFrame containing the merged history, or None
+    """
+    if recent.empty:
+        return cached
+
+    # The last stored bar may have been a partial intraday one, `recent` replaces it
+    common = cached.index[:-1].intersection(recent.index)
+    if common.empty:
+        return None
+
+    new_bars = recent.loc[recent.index > cached.index[-1]]
+    if 'Stock Splits' in new_bars and (new_bars['Stock Splits'] != 0).any():
+        return None
+    if not np.allclose(cached.loc[common, 'Close'], recent.loc[common, 'Close'], rtol=1e-6):
+        return None
+
+    older = cached.loc[cached.index < recent.index[0]].copy()
+    if 'Adj Close' in cached and 'Adj Close' in recent:
+        factors = recent.loc[common, 'Adj Close'] / cached.loc[common, 'Adj Close']
+        if not np.allclose(factors, factors.iloc[-1], rtol=1e-6):
+            return None
+        older['Adj Close'] = older['Adj Close'] * factors.iloc[-1]
+
+    return pd.concat([older, recent])
+
+class HistoryCache:
+    """
+    On-disk store of stock histories, one Parquet file per ticker and period.
+
+    An entry is fresh for `ttl` after it was written (file mtime). Reads bump
+    the access time, and `evict` drops entries that have not been read for
+    `idle_expiry` and then the least recently read ones above `max_entries`.
+    The last `memory_entries` histories read are also kept in memory, and
+    served as long as their file is unchanged. Concurrent loads of a missing
+    entry share a single fetch.
+
+    Parameters:
+    ----------
+    - directory: str
+        Folder holding the Parquet files
+    - ttl: datetime.timedelta
+        Age after which an entry is considered stale and fetched again
+    - max_entries: int
+        Maximum number of files kept in the store
+    - idle_expiry: datetime.timedelta
+        Entries not read for this long are removed by `evict`
+    - memory_entries: int
+        Number of histories kept in memory
+    - fetcher: callable
+        fetcher(ticker, period, start=None) -> pd.DataFrame, used on cache misses
+    - incremental: bool
+        Refresh stale 'max' entries by downloading only the bars after the
+        last stored one (see `refresh`) instead of the full history
+    """
+    def __init__(
+        self,
+        directory: str = HISTORY_CACHE_DIR,
+        ttl: datetime.timedelta = HISTORY_CACHE_TTL,
+        max_entries: int = HISTORY_CACHE_MAX_ENTRIES,
+        idle_expiry: datetime.timedelta = HISTORY_CACHE_IDLE_EXPIRY,
+        memory_entries: int = HISTORY_MEMORY_ENTRIES,
+        fetcher=fetch_ticker_history,
+        incremental: bool = True,
+    ):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.idle_expiry = idle_expiry
+        self.memory_entries = memory_entries
+        self.fetcher = fetcher
+        self.incremental = incremental
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._flights = SingleFlight()
+
+    def path(self, ticker: str, period: str) -> str:
+        name = re.sub(r'[^A-Za-z0-9.^=-]', '_', f"{ticker.upper()}__{period}")
+        return os.path.join(self.directory, f"{name}.parquet")
+
+    def is_fresh(self, ticker: str, period: str) -> bool:
+        try:
+            age = time.time() - os.stat(self.path(ticker, period)).st_mtime
+        except FileNotFoundError:
+            return False
+        return age < self.ttl.total_seconds()
+
+    def read(self, ticker: str, period: str) -> pd.DataFrame | None:
+        """Returns the stored history, fresh or not, or None if absent."""
+        path = self.path(ticker, period)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+            # Record the read for eviction, keeping mtime as the write time
+            os.utime(path, ns=(time.time_ns(), mtime_ns))
+        except OSError:
+            return None
+
+        with self._lock:
+            if path in self._memory and self._memory[path][0] == mtime_ns:
+                self._memory.move_to_end(path)
+                trace_note(Layer='memory')
+                return self._memory[path][1]
+        try:
+            history = pd.read_parquet(path)
+        except (OSError, ValueError):
+            return None
+        trace_note(Layer='disk')
+        self._remember(path, mtime_ns, history)
+        return history
+
+    def _remember(self, path: str, mtime_ns: int, history: pd.DataFrame) -> None:
+        with self._lock:
+            self._memory[path] = (mtime_ns, history)
+            self._memory.move_to_end(path)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, ticker: str, period: str) -> pd.DataFrame | None:
+        """Returns the stored history if it is fresh, None otherwise."""
+        if not self.is_fresh(ticker, period):
+            return None
+        return self.read(ticker, period)
+
+    def put(self, ticker: str, period: str, history: pd.DataFrame) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(ticker, period)
+        # Write then rename so concurrent readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        history.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+        self._remember(path, os.stat(path).st_mtime_ns, history)
+        self.evict()
+
+    def load(self, ticker: str, period: str) -> pd.DataFrame:
+        """Returns the history from the store, fetching it when missing or stale."""
+        with trace_stage('load_history', Ticker=ticker):
+            history = self.get(ticker, period)
+            if history is not None:
+                trace_note(Cache='hit', Rows=len(history))
+                return history
+            # Concurrent misses of a ticker, e.g. from several sessions, share one download
+            history, shared = self._flights.do((ticker.upper(), period), self._fetch, ticker, period)
+            trace_note(Cache='shared' if shared else 'miss', Rows=len(history))
+            return history
+
+    def update(self, ticker: str) -> pd.DataFrame:
+        """
+        Refreshes the stored 'max' history now, fresh or not (see `refresh`),
+        sharing the download with concurrent loads of the ticker.
+        """
+        return self._flights.do((ticker.upper(), 'max'), self.refresh, ticker)[0]
+
+    def _fetch(self, ticker: str, period: str) -> pd.DataFrame:
+        # Stored by a download that completed since the miss
+        history = self.get(ticker, period)
+        if history is not None:
+            return history
+        if self.incremental and period == 'max':
+            return self.refresh(ticker)
+        return self._download(ticker, period)
+
+    def refresh(self, ticker: str) -> pd.DataFrame:
+        """
+        Brings the stored 'max' history up to date, fresh or not.
+
+        Only bars from HISTORY_REFRESH_OVERLAP before the last stored one are
+        downloaded and merged (see `merge_history`). Falls back to a full
+        download when nothing is stored or the merge is not possible.
+        """
+        cached = self.read(ticker, 'max')
+        if cached is None or cached.empty:
+            return self._download(ticker, 'max')
+
+        start = cached.index[-1] - HISTORY_REFRESH_OVERLAP
+        with trace_stage('download', Ticker=ticker, Start=start.strftime('%Y-%m-%d')):
+            recent = self.fetcher(ticker, 'max', start=start.strftime('%Y-%m-%d'))
+            trace_note(Rows=len(recent))
+        history = merge_history(cached, recent)
+        if history is None:
+            return self._download(ticker, 'max')
+        self.put(ticker, 'max', history)
+        return history
+
+    def _download(self, ticker: str, period: str) -> pd.DataFrame:
+        with trace_stage('download', Ticker=ticker, Period=period):
+            history = self.fetcher(ticker, period)
+            trace_note(Rows=len(history))
+        # Unknown tickers come back empty, do not store them
+        if not history.empty:
+            self.put(ticker, period, history)
+        return history
+
+    def evict(self) -> None:
+        with self._lock:
+            entries = []
+            try:
+                for entry in os.scandir(self.directory):
+                    if entry.name.endswith('.parquet'):
+                        entries.append((entry.stat().st_atime, entry.path))
+            except FileNotFoundError:
+                return
+            idle_limit = time.time() - self.idle_expiry.total_seconds()
+            # Most recently read first
+            entries.sort(reverse=True)
+            for rank, (atime, path) in enumerate(entries):
+                if rank >= self.max_entries or atime < idle_limit:
+                    self._memory.pop(path, None)
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+
+    def clear(self) -> None:
+        with self._lock:
+            if os.path.isdir(self.directory):
+                for entry in os.scandir(self.directory):
+                    if entry.name.endswith('.parquet'):
+                        os.remove(entry.path)
+            self._memory.clear()
+
+history_cache = HistoryCache()
+
+def slice_period(history: pd.DataFrame, period: str) -> pd.DataFrame:
+    """
+    Returns the part of a history covered by a yahoo finance period,
+    counted back from the last bar.
+
+    Parameters:
+    ----------
+    - history: pd.DataFrame
+        Stock history indexed by date
+    - period: str
+        Period to keep (5d, 1wk, 1mo, 6mo, 1y, 10y, ytd, max)
+
+    Returns:
+    -------
+    - pd.DataFrame containing the bars of the period
+    """
+    if period == 'max' or history.empty:
+        return history
+
+    end = history.index[-1]
+    if period == 'ytd':
+        return history.loc[history.index.year == end.year]
+
+    match = re.fullmatch(r'(\d+)(d|wk|mo|y)', period)
+    if match is None:
+        raise ValueError(f"Unknown period: {period}")
+    n, unit = int(match.group(1)), match.group(2)
+    # Yahoo counts days in trading sessions
+    if unit == 'd':
+        return history.iloc[-n:]
+    offset = {
+        'wk': pd.DateOffset(weeks=n),
+        'mo': pd.DateOffset(months=n),
+        'y': pd.DateOffset(years=n),
+    }[unit]
+    return history.loc[history.index >= (end - offset).normalize()]
+
+def load_ticker_data(ticker: str, period: str, cache: HistoryCache | None = None) -> pd.DataFrame:
+    """
+    Returns stock history from a ticker and a period.
+    The full history is read from the local store (downloaded when missing or
+    stale) and the period is sliced from it, so every period of a ticker
+    shares one download.
+
+    Parameters:
+    ----------
+    - ticker: str
+        Ticker from yahoo finance
+    - period: str
+        Period to collect data from (ytd, 1wk, 1m, 6m, 1y, 10y, ..., max)
+    - cache: HistoryCache
+        Store to use, defaults to the module-level `history_cache`
+
+    Returns:
+    -------
+    - pd.DataFrame containing stock historical data
+    """
+    cache = cache if cache is not None else history_cache
+    # The stored frame is shared, hand out a copy
+    return slice_period(cache.load(ticker, 'max'), period).copy()
+
+# History loads of all sessions, see `load_histories`
+_data_executor = ThreadPoolExecutor(max_workers=DATA_MAX_WORKERS, thread_name_prefix='history-loader')
+
+def load_histories(
+    tickers: list[str],
+    period: str,
+    max_workers: int = BATCH_MAX_WORKERS,
+    timeout: float = BATCH_TIMEOUT,
+    cache: HistoryCache | None = None,
+    progress=None,
+) -> tuple[dict, dict]:
+    """
+    Returns the histories of several tickers, loaded concurrently.
+
+    Each ticker goes through `load_ticker_data` on a thread pool shared by
+    all sessions, at most `max_workers` at a time for this call. A ticker
+    still loading `timeout` seconds after it started, or whose download
+    failed or came back empty, is reported in the errors instead of failing
+    the batch.
+
+    If the wait is interrupted, e.g. when Streamlit stops a run superseded
+    by a rerun, loads not started yet are cancelled. Running downloads
+    complete in the background and are stored, so the next run shares them
+    instead of downloading again.
+
+    Parameters:
+    ----------
+    - tickers: list[str]
+        Tickers from yahoo finance
+    - period: str
+        Period to collect data from (ytd, 1wk, 1m, 6m, 1y, 10y, ..., max)
+    - max_workers: int
+        Maximum number of concurrent downloads
+    - timeout: float
+        Seconds allowed per ticker
+    - cache: HistoryCache
+        Store to use, defaults to the module-level `history_cache`
+    - progress: callable
+        progress(done, total), called every LOAD_POLL_INTERVAL seconds while
+        waiting, see `progress_bar`. Drawing in Streamlit lets a rerun
+        interrupt the wait.
+
+    Returns:
+    -------
+    - dict mapping each loaded ticker to its history
+    - dict mapping each failed ticker to its exception
+    """
+    tickers = list(dict.fromkeys(tickers))
+    histories, errors, started = {}, {}, {}
+    traced = trace_enabled()
+
+    def load(ticker):
+        started[ticker] = time.monotonic()
+        # Cache results and download timings go back with the history
+        with trace_worker(traced) as stages:
+            history = load_ticker_data(ticker, period, cache=cache)
+        return history, stages
+
+    def fail(ticker, error):
+        errors[ticker] = error
+        elapsed = time.monotonic() - started.get(ticker, time.monotonic())
+        trace_merge([{'Stage': 'load_history', 'Depth': 0, 'Ticker': ticker, 'Error': str(error), 'Ms': elapsed * 1000}])
+
+    queue = iter(tickers)
+    futures, pending = {}, set()
+    try:
+        while True:
+            for ticker in islice(queue, max_workers - len(pending)):
+                future = _data_executor.submit(load, ticker)
+                futures[future] = ticker
+                pending.add(future)
+            if not pending:
+                break
+
+            # Wake up at the next deadline of a running ticker, or to report progress
+            deadlines = [started[futures[future]] + timeout for future in pending if futures[future] in started]
+            wait_for = min(max(min(deadlines) - time.monotonic(), 0), LOAD_POLL_INTERVAL) if deadlines else LOAD_POLL_INTERVAL
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                ticker = futures[future]
+                try:
+                    history, stages = future.result()
+                except Exception as e:
+                    fail(ticker, e)
+                    continue
+                trace_merge(stages)
+                if history.empty:
+                    errors[ticker] = ValueError(f"No data found for {ticker}")
+                else:
+                    histories[ticker] = history
+
+            now = time.monotonic()
+            for future in list(pending):
+                ticker = futures[future]
+                if ticker in started and now - started[ticker] >= timeout:
+                    # Finishes in the background, its result is dropped
+                    fail(ticker, TimeoutError(f"{ticker} took more than {timeout}s"))
+                    pending.discard(future)
+
+            if progress is not None:
+                progress(len(histories) + len(errors), len(tickers))
+    finally:
+        for future in pending:
+            future.cancel()
+
+    return histories, errors
+
+class BackgroundDownloads:
+    """
+    Histories downloaded on a background thread, so a page can queue many
+    tickers and return at once.
+
+    Queued tickers are loaded BACKGROUND_CHUNK_SIZE at a time with
+    `load_histories` and stored, the histories are not kept. Tickers already
+    queued are not queued again.
+
+    Parameters:
+    ----------
+    - period: str
+        Period of the histories to load
+    - cache: HistoryCache
+        Store to fill, defaults to the module-level `history_cache`
+    """
+    def __init__(self, period: str = 'max', cache: HistoryCache | None = None):
+        self.period = period
+        self._cache = cache
+        # Insertion ordered set of the tickers not loaded yet
+        self._queued = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def pending(self) -> int:
+        """Number of tickers queued or loading."""
+        with self._lock:
+            return len(self._queued)
+
+    def submit(self, tickers: list[str]) -> int:
+        """Queues tickers and returns the number of tickers newly queued."""
+        with self._lock:
+            new = [ticker for ticker in dict.fromkeys(tickers) if ticker not in self._queued]
+            self._queued.update(dict.fromkeys(new))
+            if new and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='history-download', daemon=True)
+                self._thread.start()
+        return len(new)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                chunk = list(islice(self._queued, BACKGROUND_CHUNK_SIZE))
+                if not chunk:
+                    self._thread = None
+                    return
+            try:
+                _, errors = load_histories(chunk, self.period, cache=self._cache)
+                if errors:
+                    logger.info('%d of %d background downloads failed', len(errors), len(chunk))
+            except Exception:
+                logger.exception('background downloads failed')
+            with self._lock:
+                for ticker in chunk:
+                    self._queued.pop(ticker, None)
+
+background_downloads = BackgroundDownloads()
+
+def load_many(
+    tickers: list[str],
+    period: str,
+    max_workers: int = BATCH_MAX_WORKERS,
+    timeout: float = BATCH_TIMEOUT,
+    cache: HistoryCache | None = None,
+    progress=None,
+) -> tuple[pd.DataFrame, dict]:
+    """
+    Returns the histories of several tickers in one panel, see
+    `load_histories` for the loading, timeout and cancellation rules and
+    the parameters.
+
+    Returns:
+    -------
+    - pd.DataFrame with one column per (ticker, field), aligned on the
+      exchange-local date of each bar
+    - dict mapping each failed ticker to its exception
+    """
+    tickers = list(dict.fromkeys(tickers))
+    histories, errors = load_histories(tickers, period, max_workers, timeout, cache, progress)
+    if not histories:
+        return pd.DataFrame(), errors
+
+    frames = {}
+    for ticker in tickers:
+        if ticker in histories:
+            history = histories[ticker]
+            # Exchanges live in different timezones, align on local dates
+            if history.index.tz is not None:
+                history = history.tz_localize(None)
+            history.index = history.index.normalize().rename('Date')
+            frames[ticker] = history
+    panel = pd.concat(frames, axis=1, names=['Ticker', 'Field']).sort_index()
+    return panel, errors
+
+def progress_bar(label: str, container=st):
+    """
+    Returns a progress(done, total) callback for `load_histories` and
+    `load_many` drawing a progress bar, removed once everything is loaded.
+
+    Parameters:
+    ----------
+    - label: str
+        Text shown next to the counts, e.g. 'Downloading'
+    - container
+        Streamlit container to draw in, e.g. `st` or a column
+    """
+    placeholder = container.empty()
+
+    def progress(done: int, total: int) -> None:
+        if done >= total:
+            placeholder.empty()
+        else:
+            placeholder.progress(done / total, text=f"{label} {done}/{total}")
+    return progress
+
+def dividend_events(panel: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the dividend distributions of a multi-ticker history in long format.
+
+    Parameters:
+    ----------
+    - panel: pd.DataFrame
+        Histories with (ticker, field) columns, as returned by `load_many`
+
+    Returns:
+    -------
+    - pd.DataFrame with Ticker, Date and Dividends columns, one row per distribution
+    """
+    events = (panel
+        .xs('Dividends', axis=1, level='Field')
+        .rename_axis(index='Date', columns='Ticker')
+        .reset_index()
+        .melt(id_vars='Date', var_name='Ticker', value_name='Dividends')
+    )
+    return events.loc[events.Dividends > 0, ['Ticker', 'Date', 'Dividends']].reset_index(drop=True)
+
+def process_dividend_panel(dividends: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the dividend model of many tickers, computed in one grouped pass.
+
+    Parameters:
+    ----------
+    - dividends: pd.DataFrame
+        Long format distributions with Ticker, Date and Dividends columns
+
+    Returns:
+    -------
+    - pd.DataFrame with one row per ticker and month with a distribution:
+      Ticker, Date, Dividends, AnnualDividendCount, SmoothedDividends,
+      YearlyDividends and DivGrowth
+    """
+    events = dividends.loc[dividends.Dividends > 0, ['Ticker', 'Date', 'Dividends']]
+    events = events.sort_values(['Ticker', 'Date'], kind='stable')
+
+    # Keep one distribution per month
+    dates = pd.DatetimeIndex(events.Date)
+    events = events.assign(Year=dates.year, Month=dates.year * 12 + dates.month)
+    events = events.drop_duplicates(subset=['Ticker', 'Month']).reset_index(drop=True)
+    by_ticker = events.groupby('Ticker', sort=False)
+
+    # Count distributions per year
+    yearly = events.groupby(['Ticker', 'Year']).Dividends.agg(['count', 'sum'])
+    yearly_by_ticker = yearly.groupby(level='Ticker')
+    position = yearly_by_ticker.cumcount()
+    n_years = yearly_by_ticker['count'].transform('size')
+    # First and current year do not have all distributions, use next and previous year's numbers
+    counts = yearly['count'].astype(float)
+    counts = counts.where(position > 0, yearly_by_ticker['count'].shift(-1)).fillna(yearly['count'])
+    counts = counts.where(position < n_years - 1, counts.groupby(level='Ticker').shift(1)).fillna(yearly['count'])
+
+    # Map values
+    keys = pd.MultiIndex.from_frame(events[['Ticker', 'Year']])
+    events['AnnualDividendCount'] = pd.cut(
+        counts.reindex(keys).to_numpy(),
+        bins=[-np.inf, 0, 1, 2, 3, 4, 8, 12],
+        labels=[0, 1, 2, 4, 4, 4, 12],
+        ordered=False,
+    ).astype(int)
+
+    events['SmoothedDividends'] = (by_ticker
+        .Dividends
+        .rolling(5, center=True)
+        .median()
+        .droplevel('Ticker')
+    )
+    events['SmoothedDividends'] = events.SmoothedDividends.combine_first(events.Dividends)
+
+    events['YearlyDividends'] = np.where(
+        events.AnnualDividendCount <= 3,
+        yearly['sum'].reindex(keys).to_numpy(),
+        events.SmoothedDividends * events.AnnualDividendCount
+    )
+
+    # Growth in dividends since beginning of timeframe
+    events['DivGrowth'] = events.YearlyDividends / by_ticker.YearlyDividends.transform('first') - 1
+
+    return events.drop(columns=['Year', 'Month'])
+
+def process_dividend_history(history: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the dividend model of a single ticker, see `process_dividend_panel`.
+
+    Parameters:
+    ----------
+    - history: pd.DataFrame
+        Stock history indexed by date, with a Dividends column
+
+    Returns:
+    -------
+    - pd.DataFrame with one row per month with a distribution
+    """
+    dividends = (history
+        .loc[history.Dividends > 0, 'Dividends']
+        .rename_axis('Date')
+        .reset_index()
+        .assign(Ticker='')
+    )
+    return process_dividend_panel(dividends).drop(columns=['Ticker'])
+
+class DividendModel:
+    """
+    Dividend model of a single ticker (see `process_dividend_panel`) updated
+    as new distributions come in, instead of recomputed from the whole
+    record.
+
+    Adding distributions only recomputes the years whose count or total
+    changed and the last entries of the centered rolling median, so a daily
+    update costs O(new distributions). `frame` returns the same model as
+    `process_dividend_history`. `extends` tells whether a history can be
+    added with `update`, or was rewritten and needs a new model.
+
+    Parameters:
+    ----------
+    - history: pd.DataFrame
+        Stock history indexed by date, with a Dividends column
+    """
+    COLUMNS = ['Date', 'Dividends', 'AnnualDividendCount', 'SmoothedDividends', 'YearlyDividends', 'DivGrowth']
+    # Width of the centered rolling median of distributions
+    WINDOW = 5
+
+    def __init__(self, history: pd.DataFrame | None = None):
+        self.dates = []
+        self.dividends = []
+        self.annual_counts = []
+        self.smoothed = []
+        self.yearly_dividends = []
+        # Per calendar year with distributions: first event index, count and total
+        self.years = []
+        self._year_start = []
+        self._year_count = []
+        self._year_sum = []
+        self._year_annual_count = []
+        self.first_bar = None
+        self.last_bar = None
+        # Sum of the hashes of the distributions of every bar seen
+        self.checksum = 0
+        if history is not None:
+            self.update(history)
+
+    @staticmethod
+    def _checksum(bars: pd.DataFrame) -> int:
+        paid = bars.Dividends[bars.Dividends > 0]
+        # Summed per row, so bars can be added to it
+        return int(pd.util.hash_pandas_object(paid).sum())
+
+    def extends(self, history: pd.DataFrame) -> bool:
+        """
+        Returns whether a history starts with the bars the model was built
+        from, with the same distributions, so that `update` can add its new
+        bars. A history downloaded again after a split or a dividend
+        correction does not.
+        """
+        if self.last_bar is None or history.empty or history.index[0] != self.first_bar:
+            return False
+        end = history.index.searchsorted(self.last_bar, side='right')
+        if end == 0 or history.index[end - 1] != self.last_bar:
+            return False
+        return self._checksum(history.iloc[:end]) == self.checksum
+
+    @staticmethod
+    def _annual_count(count: float) -> int:
+        # Same bins as process_dividend_panel
+        if count <= 0:
+            return 0
+        if count <= 1:
+            return 1
+        if count <= 2:
+            return 2
+        if count <= 8:
+            return 4
+        return 12
+
+    def update(self, bars: pd.DataFrame) -> int:
+        """
+        Adds the distributions of the bars after the last one already seen,
+        e.g. the history returned by a refresh of the history store.
+
+        Parameters:
+        ----------
+        - bars: pd.DataFrame
+            Stock history indexed by date, with a Dividends column
+
+        Returns:
+        -------
+        - int number of distributions added
+        """
+        if bars.empty:
+            return 0
+        if self.last_bar is not None:
+            bars = bars.iloc[bars.index.searchsorted(self.last_bar, side='right'):]
+            if bars.empty:
+                return 0
+        else:
+            self.first_bar = bars.index[0]
+        self.last_bar = bars.index[-1]
+        self.checksum = (self.checksum + self._checksum(bars)) % 2 ** 64
+        paid = bars.Dividends.to_numpy() > 0
+        return self.add(bars.index[paid], bars.Dividends.to_numpy()[paid])
+
+    def add(self, dates, dividends) -> int:
+        """
+        Adds distributions dated after the last one of the model.
+
+        Parameters:
+        ----------
+        - dates: sequence of pd.Timestamp, increasing
+        - dividends: sequence of float, amount of each distribution
+
+        Returns:
+        -------
+        - int number of distributions added, only the first one of each
+          month being kept
+        """
+        n_before = len(self.dates)
+        years_before = len(self.years)
+        for date, dividend in zip(dates, dividends):
+            date = pd.Timestamp(date)
+            if self.dates:
+                last = self.dates[-1]
+                if date <= last:
+                    raise ValueError(f"Distribution of {date:%Y-%m-%d} is not after the last one, rebuild the model")
+                # Keep one distribution per month
+                if (date.year, date.month) == (last.year, last.month):
+                    continue
+            if not self.years or self.years[-1] != date.year:
+                self.years.append(date.year)
+                self._year_start.append(len(self.dates))
+                self._year_count.append(0)
+                self._year_sum.append(0.0)
+                self._year_annual_count.append(None)
+            self._year_count[-1] += 1
+            self._year_sum[-1] += float(dividend)
+            self.dates.append(date)
+            self.dividends.append(float(dividend))
+            self.annual_counts.append(0)
+            self.smoothed.append(float(dividend))
+            self.yearly_dividends.append(0.0)
+
+        n = len(self.dates)
+        if n == n_before:
+            return 0
+
+        # Counts and totals change for the previous last year and the new
+        # years, the first year's count depends on the second one
+        dirty = set()
+        first_changed = max(years_before - 1, 0)
+        for k in [0, *range(max(first_changed, 1), len(self.years))]:
+            annual_count = self._annual_count(self._corrected_count(k))
+            if k >= first_changed or annual_count != self._year_annual_count[k]:
+                self._year_annual_count[k] = annual_count
+                dirty.update(range(self._year_start[k], self._year_end(k)))
+
+        # Rolling medians whose window now contains new distributions
+        half = self.WINDOW // 2
+        for i in range(max(n_before - half, 0), n):
+            if half <= i < n - half:
+                self.smoothed[i] = float(np.median(self.dividends[i - half:i + half + 1]))
+            else:
+                self.smoothed[i] = self.dividends[i]
+            dirty.add(i)
+
+        for i in dirty:
+            k = self._year_index(i)
+            annual_count = self._year_annual_count[k]
+            self.annual_counts[i] = annual_count
+            self.yearly_dividends[i] = self._year_sum[k] if annual_count <= 3 else self.smoothed[i] * annual_count
+        return n - n_before
+
+    def _year_end(self, k: int) -> int:
+        return self._year_start[k + 1] if k + 1 < len(self.years) else len(self.dates)
+
+    def _year_index(self, i: int) -> int:
+        return bisect_left(self._year_start, i + 1) - 1
+
+    def _corrected_count(self, k: int) -> int:
+        # First and current year do not have all distributions, use next and previous year's numbers
+        last = len(self.years) - 1
+        if k == last and last > 0:
+            k -= 1
+            if k == 0:
+                return self._year_count[1]
+            return self._year_count[k]
+        if k == 0 and last > 0:
+            return self._year_count[1]
+        return self._year_count[k]
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """Returns the model, one row per month with a distribution."""
+        if not self.dates:
+            return pd.DataFrame({
+                'Date': pd.DatetimeIndex([], tz=getattr(self.first_bar, 'tz', None)),
+                'Dividends': pd.Series(dtype=float),
+                'AnnualDividendCount': pd.Series(dtype=int),
+                'SmoothedDividends': pd.Series(dtype=float),
+                'YearlyDividends': pd.Series(dtype=float),
+                'DivGrowth': pd.Series(dtype=float),
+            })
+        yearly_dividends = np.asarray(self.yearly_dividends)
+        return pd.DataFrame({
+            'Date': pd.DatetimeIndex(self.dates),
+            'Dividends': self.dividends,
+            'AnnualDividendCount': np.asarray(self.annual_counts, dtype=int),
+            'SmoothedDividends': self.smoothed,
+            'YearlyDividends': yearly_dividends,
+            # Growth in dividends since beginning of timeframe
+            'DivGrowth': yearly_dividends / yearly_dividends[0] - 1,
+        })
+
+def asof_dividends(dates: pd.DatetimeIndex, dividends: pd.DataFrame, limit: int = 300) -> np.ndarray:
+    """
+    Returns the trailing yearly dividends of a dividend model as of each date.
+
+    Each distribution carries forward for at most `limit` bars, dates without
+    a distribution in that window get 0. Both dates and distributions are
+    sorted, so the join is a binary search instead of a merge.
+
+    Parameters:
+    ----------
+    - dates: pd.DatetimeIndex
+        Sorted dates of the price history
+    - dividends: pd.DataFrame
+        Dividend model with Date and YearlyDividends columns
+    - limit: int
+        Number of bars a distribution carries forward
+
+    Returns:
+    -------
+    - np.ndarray of float, aligned with dates
+    """
+    event_dates = pd.DatetimeIndex(dividends.Date)
+    events = dates.searchsorted(event_dates)
+    # Only distributions paid on a bar of the history, as a merge on Date would
+    matched = events < len(dates)
+    matched[matched] = dates[events[matched]] == event_dates[matched]
+    events = events[matched]
+    values = dividends.YearlyDividends.to_numpy(dtype=float)[matched]
+
+    # Last distribution at or before each bar
+    bars = np.arange(len(dates))
+    last = np.searchsorted(events, bars, side='right') - 1
+    valid = last >= 0
+    valid[valid] = bars[valid] - events[last[valid]] <= limit
+
+    yearly_dividends = np.zeros(len(dates))
+    yearly_dividends[valid] = values[last[valid]]
+    return yearly_dividends
+
+def compute_dividend_yield(history: pd.DataFrame, dividends: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Returns daily prices with trailing yearly dividends and dividend yield.
+
+    Parameters:
+    ----------
+    - history: pd.DataFrame
+        Stock history indexed by date
+    - dividends: pd.DataFrame
+        Dividend model of the stock, computed from history when not given
+
+    Returns:
+    -------
+    - pd.DataFrame starting at the first distribution, with Date, Close,
+      YearlyDividends, Drawdown and DividendYield
+    """
+    if dividends is None:
+        with trace_stage('process_dividend_history'):
+            dividends = process_dividend_history(history)
+            trace_note(Rows=len(dividends))
+
+    # Align dividends with price history
+    with trace_stage('asof_dividends', Rows=len(history)):
+        yearly_dividends = asof_dividends(history.index, dividends)
+
+    close = history.Close
+    if close.hasnans:
+        close = close.ffill(limit=300).fillna(0)
+    close = close.to_numpy(dtype=float)
+    drawdown = close / np.maximum.accumulate(close) - 1
+
+    # Keep data from first dividend
+    first = np.flatnonzero(yearly_dividends > 0)[0]
+    yearly_dividends, close = yearly_dividends[first:], close[first:]
+    return pd.DataFrame({
+        'Date': history.index[first:],
+        'Close': close,
+        'YearlyDividends': yearly_dividends,
+        'Drawdown': drawdown[first:],
+        # Calculate dividend yield base on TTM distributions
+        'DividendYield': yearly_dividends / close,
+    }, index=pd.RangeIndex(first, len(history)))
+
+def dividend_yield_stats(history: pd.DataFrame, dividends: pd.DataFrame | None = None) -> dict | None:
+    """
+    Returns the current dividend yield of a stock compared to its history.
+
+    Parameters:
+    ----------
+    - history: pd.DataFrame
+        Stock history indexed by date
+    - dividends: pd.DataFrame
+        Dividend model of the stock, computed from history when not given
+
+    Returns:
+    -------
+    - dict with the last Close, the current TTM DividendYield, its
+      YieldPercentile within the history, the MedianYield and the
+      UpsideToMedian price move, or None if the stock pays no dividend
+    """
+    if not (history.Dividends > 0).any():
+        return None
+
+    df = compute_dividend_yield(history, dividends)
+    current_yield = df.DividendYield.iloc[-1]
+    median_yield = df.DividendYield.quantile(q=0.5)
+    return {
+        'Close': df.Close.iloc[-1],
+        'DividendYield': current_yield,
+        'YieldPercentile': df.DividendYield.rank(pct=True).iloc[-1],
+        'MedianYield': median_yield,
+        'UpsideToMedian': current_yield / median_yield - 1,
+        'LastDate': df.Date.iloc[-1].date(),
+    }
+
+def build_holdings_store(csv_path: str) -> str:
+    """
+    Converts a holdings CSV file to a typed Parquet file next to it, with
+    HOLDINGS_CATEGORY_COLUMNS stored as categoricals.
+
+    Parameters:
+    ----------
+    - csv_path: str
+        Path of the CSV file
+
+    Returns:
+    -------
+    - str path of the Parquet file
+    """
+    parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+    holdings = pd.read_csv(csv_path)
+    for column in HOLDINGS_CATEGORY_COLUMNS:
+        if column in holdings:
+            holdings[column] = holdings[column].astype('category')
+    tmp_path = f"{parquet_path}.{os.getpid()}.tmp"
+    holdings.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, parquet_path)
+    return parquet_path
+
+@st.cache_resource(show_spinner=False)
+def load_holdings(csv_path: str) -> pd.DataFrame:
+    """
+    Returns a holdings file, loaded once per process and shared by all
+    sessions: the returned frame must not be modified. The typed Parquet
+    copy (see `build_holdings_store`) is read, and rebuilt first when
+    missing or older than the CSV file.
+
+    Parameters:
+    ----------
+    - csv_path: str
+        Path of the CSV file, e.g. data/individual_positions.csv
+
+    Returns:
+    -------
+    - pd.DataFrame
+    """
+    parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+    if not os.path.exists(parquet_path) or os.path.getmtime(parquet_path) < os.path.getmtime(csv_path):
+        build_holdings_store(csv_path)
+    return pd.read_parquet(parquet_path)
+
+@st.cache_resource(show_spinner=False)
+def load_universe(path: str = UNIVERSE_PATH) -> pd.DataFrame:
+    """
+    Returns the stock universe with Name, Ticker, Sector, Location and
+    Asset Class, one row per ticker. Shared by all sessions, must not be
+    modified.
+    """
+    return load_holdings(path).drop_duplicates(subset='Ticker').reset_index(drop=True)
+
+def yahoo_holdings(holdings: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the holdings whose tickers are yahoo finance symbols, see
+    YAHOO_LOCATIONS.
+    """
+    return holdings[holdings.Location.isin(YAHOO_LOCATIONS)]
+
+class TickerIndex:
+    """
+    Prefix search over the tickers and names of a set of holdings.
+
+    Tickers, and every name from each of its words on, are kept in sorted
+    lists: a search is a couple of binary searches per list, so a universe
+    of thousands of stocks is searched in well under a millisecond.
+    """
+    def __init__(self, holdings: pd.DataFrame):
+        """
+        Parameters:
+        ----------
+        - holdings: pd.DataFrame
+            One row per searchable entry, with at least Ticker and Name
+        """
+        self.holdings = holdings.reset_index(drop=True)
+        tickers = self.holdings.Ticker.astype(str).str.upper().tolist()
+        names = self.holdings.Name.fillna('').astype(str).str.upper().tolist()
+
+        self._exact = {}
+        for row, ticker in enumerate(tickers):
+            self._exact.setdefault(ticker, row)
+
+        # "MICROSOFT CORP" is found from "MICRO" and from "CORP"
+        starts, later_words = [], []
+        for row, name in enumerate(names):
+            words = name.split()
+            starts.append((' '.join(words), row))
+            later_words.extend((' '.join(words[i:]), row) for i in range(1, len(words)))
+        # Searched in this order
+        self._sorted_keys = [
+            sorted((ticker, row) for row, ticker in enumerate(tickers)),
+            sorted(starts),
+            sorted(later_words),
+        ]
+        self._keys = [[key for key, _ in entries] for entries in self._sorted_keys]
+
+    @staticmethod
+    def _normalize(query: str) -> str:
+        return ' '.join(str(query).upper().split())
+
+    def lookup(self, ticker: str) -> pd.Series | None:
+        """
+        Returns the holding of a ticker, or None when it is not indexed.
+        """
+        row = self._exact.get(self._normalize(ticker))
+        return None if row is None else self.holdings.iloc[row]
+
+    def search(self, query: str, limit: int | None = TICKER_SEARCH_LIMIT) -> pd.DataFrame:
+        """
+        Returns the holdings matching a query, best matches first: exact
+        ticker, ticker prefix, name prefix, then prefix of a later word of
+        the name.
+
+        Parameters:
+        ----------
+        - query: str
+            Start of a ticker or of any word of a name, case insensitive
+        - limit: int
+            Maximum number of matches, None for all
+
+        Returns:
+        -------
+        - pd.DataFrame, rows of `holdings`
+        """
+        query = self._normalize(query)
+        if not query:
+            return self.holdings.iloc[:0]
+
+        rows = {}
+        if query in self._exact:
+            rows[self._exact[query]] = None
+        end = query + '\U0010ffff'
+        for entries, keys in zip(self._sorted_keys, self._keys):
+            for _, row in entries[bisect_left(keys, query):bisect_left(keys, end)]:
+                if limit is not None and len(rows) >= limit:
+                    break
+                rows[row] = None
+        return self.holdings.iloc[list(rows)]
+
+@st.cache_resource(show_spinner=False)
+def get_ticker_index(path: str = UNIVERSE_PATH) -> TickerIndex:
+    """
+    Returns the search index of the stock universe, built once per process.
+    Only tickers that are yahoo finance symbols are indexed, the others may
+    collide with unrelated US tickers (see YAHOO_LOCATIONS).
+    """
+    return TickerIndex(yahoo_holdings(load_universe(path)))
+
+def ticker_search(container, label: str, value: str = '') -> str:
+    """
+    Ticker input with typeahead: the text typed is searched in the stock
+    universe and the best matches are offered in a selectbox. Unless it is
+    a ticker of the universe, the text as typed comes first, so tickers
+    outside of the universe (ETFs, indexes...) stay available. It is
+    selected unless names start with the whole words typed, e.g. "apple",
+    in which case the shortest of them is ("APPLE INC").
+
+    Parameters:
+    ----------
+    - container
+        Streamlit container to draw in, e.g. `st` or a column
+    - label: str
+        Label of the text input
+    - value: str
+        Initial text
+
+    Returns:
+    -------
+    - str upper-cased ticker
+    """
+    query = container.text_input(label, value=value)
+    typed = query.strip().upper()
+    matches = get_ticker_index().search(query)
+    if matches.empty:
+        return typed
+    names = dict(zip(matches.Ticker, matches.Name))
+    options = list(names) if typed in names else [typed, *names]
+    index = 0
+    if typed not in names:
+        words = TickerIndex._normalize(query)
+        named = [
+            ticker for ticker, name in names.items()
+            if f"{TickerIndex._normalize(name)} ".startswith(f"{words} ")
+        ]
+        if named:
+            index = options.index(min(named, key=lambda ticker: len(str(names[ticker]))))
+    return container.selectbox(
+        f"{label} matches",
+        options=options,
+        index=index,
+        format_func=lambda ticker: f"{ticker} · {names[ticker]}" if ticker in names else ticker,
+        label_visibility='collapsed',
+    )
+
+def _screen_chunk(directory: str, tickers: list[str], period: str) -> tuple[list[dict], list[str]]:
+    # Runs in a worker process: only reads the stored histories
+    cache = HistoryCache(directory, memory_entries=0)
+    histories, missing = {}, []
+    for ticker in tickers:
+        history = cache.read(ticker, 'max')
+        if history is None:
+            missing.append(ticker)
+            continue
+        history = slice_period(history, period)
+        # Exchanges live in different timezones, work on local dates
+        if history.index.tz is not None:
+            history = history.tz_localize(None)
+        histories[ticker] = history
+    if not histories:
+        return [], missing
+
+    # Dividend model of the whole chunk in one pass
+    events = pd.concat(
+        [history.loc[history.Dividends > 0, ['Dividends']].rename_axis('Date').reset_index().assign(Ticker=ticker)
+        for ticker, history in histories.items()],
+        ignore_index=True
+    )
+    if events.empty:
+        return [], missing
+    panel = process_dividend_panel(events)
+
+    rows = []
+    for ticker, dividends in panel.groupby('Ticker', sort=False):
+        try:
+            stats = dividend_yield_stats(histories[ticker], dividends.drop(columns=['Ticker']))
+        except (IndexError, ValueError):
+            # Too few distributions in the period to build a yield history
+            continue
+        rows.append({'Ticker': ticker, **stats})
+    return rows, missing
 
-def load_ticker_data(ticker: str, period: str) -> pd.DataFrame:
+# Worker processes of the screener, see `screener_pool`
+_screener_pool = None
+_screener_pool_lock = threading.Lock()
+
+def screener_pool() -> ProcessPoolExecutor:
     """
-    Returns stock history from a ticker and a period.
+    Returns the worker processes of the screener, started once per process.
+
+    Streamlit runs pages as `__main__`, which 'spawn' and 'forkserver'
+    workers would import and run again, so workers are forked where
+    possible. They are all forked together on the first scan and reused
+    after, rather than forking the multithreaded server on every scan.
+    """
+    global _screener_pool
+    with _screener_pool_lock:
+        if _screener_pool is None:
+            method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+            _screener_pool = ProcessPoolExecutor(
+                max_workers=SCREENER_MAX_WORKERS,
+                mp_context=multiprocessing.get_context(method)
+            )
+        return _screener_pool
+
+def screen_dividend_yields(
+    tickers: list[str],
+    period: str = '10y',
+    cache: HistoryCache | None = None,
+) -> tuple[pd.DataFrame, list[str]]:
+    """
+    Returns the dividend yield statistics of many stocks, see `dividend_yield_stats`.
+
+    Only histories already in the local store are used, nothing is downloaded.
+    Tickers are split in chunks scanned in parallel by the `screener_pool`
+    workers.
 
     Parameters:
     ----------
-    - ticker: str
-        Ticker from yahoo finance
+    - tickers: list[str]
+        Tickers from yahoo finance
     - period: str
-        Period to collect data from (ytd, 1wk, 1m, 6m, 1y, 10y, ..., max)
+        Period of history the current yield is compared to
+    - cache: HistoryCache
+        Store to read, defaults to the module-level `history_cache`
 
     Returns:
     -------
-    - pd.DataFrame containing stock historical data
+    - pd.DataFrame indexed by Ticker, one row per dividend paying stock
+    - list of tickers with no stored history
     """
-    return yf.Ticker(ticker).history(
-        period=period,
-        auto_adjust=False
-    )
+    global _screener_pool
+    cache = cache if cache is not None else history_cache
+    tickers = list(dict.fromkeys(tickers))
+    chunks = [tickers[i:i + SCREENER_CHUNK_SIZE] for i in range(0, len(tickers), SCREENER_CHUNK_SIZE)]
 
-def process_dividend_history(history: pd.DataFrame) -> pd.DataFrame:
-    # Get df with dividend distributions
-    dividends = history.loc[history.Dividends > 0, 'Dividends'].to_frame()
+    if len(chunks) <= 1:
+        results = [_screen_chunk(cache.directory, chunk, period) for chunk in chunks]
+    else:
+        executor = screener_pool()
+        try:
+            results = list(executor.map(_screen_chunk, repeat(cache.directory), chunks, repeat(period)))
+        except BrokenProcessPool:
+            # A worker died, start new ones on the next scan
+            with _screener_pool_lock:
+                if _screener_pool is executor:
+                    _screener_pool = None
+            raise
 
-    dividends['Month'] = dividends.index.to_period('1M')
-    dividends = (dividends
-        .reset_index()
-        .groupby('Month', as_index=False)
-        .first()
-        .set_index('Date')
-        .drop(columns=['Month'])
-    )
+    rows = [row for chunk_rows, _ in results for row in chunk_rows]
+    missing = [ticker for _, chunk_missing in results for ticker in chunk_missing]
+    columns = ['Ticker', 'Close', 'DividendYield', 'YieldPercentile', 'MedianYield', 'UpsideToMedian', 'LastDate']
+    return pd.DataFrame(rows, columns=columns).set_index('Ticker'), missing
 
-    # Count distributions per year
-    yearly_distributions = dividends.groupby(dividends.index.year).Dividends.count()
+def compute_yield_bands(history: pd.DataFrame, dividends: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Returns the dividend yield frame used by the dividend charts, with the
+    yield percentile statistics in its `attrs`:
+    - Quantiles: dividend yield deciles, from 0% to 100%
+    - MedianYield: median dividend yield
+    - YieldPercentile: share of the period with a lower yield than today
+    - UpsideDownside: ratio of the current yield to the median yield
 
-    # First and current year do not have all distributions, use next and previous year's numbers
-    yearly_distributions.iloc[0] = yearly_distributions.iloc[1]
-    yearly_distributions.iloc[-1] = yearly_distributions.iloc[-2]
-    # Map values
-    dividends['AnnualDividendCount'] = dividends.index.year.map(yearly_distributions)
-    dividends['AnnualDividendCount'] = pd.cut(
-        dividends.AnnualDividendCount,
-        bins=[-np.inf, 0, 1, 2, 3, 4, 8, 12],
-        labels=[0, 1, 2, 4, 4, 4, 12],
-        ordered=False,
-    ).astype(int)
+    Parameters:
+    ----------
+    - history: pd.DataFrame
+        Stock history indexed by date
+    - dividends: pd.DataFrame
+        Dividend model of the stock, computed from history when not given
 
-    dividends['SmoothedDividends'] = (dividends
-        .Dividends
-        .rolling(5, center=True)
-        .median()
-    )
-    # ).bfill().ffill()
-    dividends['SmoothedDividends'] = dividends.SmoothedDividends.combine_first(dividends.Dividends)
-    # dividends['YearlyDividends'] = dividends.SmoothedDividends * dividends.AnnualDividendCount
-
-    dividends['YearlyDividends']= np.where(
-        dividends.AnnualDividendCount <= 3, 
-        dividends.index.year.map(dividends.groupby(dividends.index.year).Dividends.sum()),
-        dividends.SmoothedDividends * dividends.AnnualDividendCount
-    )
+    Returns:
+    -------
+    - pd.DataFrame with Date, Close, YearlyDividends, DividendYield and Drawdown
+    """
+    df = compute_dividend_yield(history, dividends)
+    bands = df[['Date', 'Close', 'YearlyDividends', 'DividendYield', 'Drawdown']].reset_index(drop=True)
 
-    # Get at least one full year
-    #dividends = dividends.loc[dividends.index > dividends.index[0] + datetime.timedelta(days=365)]
+    with trace_stage('quantile_bands', Rows=len(df)):
+        median_yield = df.DividendYield.quantile(q=0.5)
+        bands.attrs = {
+            'Quantiles': df.DividendYield.quantile(q=np.arange(0, 1.1, .1)).tolist(),
+            'MedianYield': median_yield,
+            'YieldPercentile': df.DividendYield.rank(pct=True).iloc[-1],
+            'UpsideDownside': df.DividendYield.iloc[-1] / median_yield,
+        }
+    return bands
 
-    # Growth in dividends since beginning of timeframe
-    dividends['DivGrowth'] = dividends['YearlyDividends'] / dividends['YearlyDividends'].iloc[0] - 1
-    dividends = dividends.reset_index()
-    
-    return dividends
+class YieldBandStore:
+    """
+    Precomputed yield bands (see `compute_yield_bands`) for each ticker and
+    period, stored in a 'bands' folder of the history store.
 
-def generate_dividend_chart(ticker, period, currency_symbol='$'):
-    # Load historical data
-    history = load_ticker_data(
+    Entries are tagged with the state of the history they were computed
+    from, and recomputed only when the history got new or updated bars.
+    The dividend models of the last `max_models` full histories used are
+    kept in memory and updated with the new bars only (see `DividendModel`).
+
+    Parameters:
+    ----------
+    - cache: HistoryCache
+        History store, defaults to the module-level `history_cache`
+    - max_models: int
+        Number of dividend models kept in memory
+    """
+    def __init__(self, cache: HistoryCache | None = None, max_models: int = DIVIDEND_MODEL_ENTRIES):
+        self._cache = cache
+        self.max_models = max_models
+        self._stores = {}
+        # Ticker -> [lock, model], least recently used first
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self) -> HistoryCache:
+        return self._cache if self._cache is not None else history_cache
+
+    @property
+    def store(self) -> HistoryCache:
+        directory = os.path.join(self.cache.directory, 'bands')
+        if directory not in self._stores:
+            self._stores[directory] = HistoryCache(directory, fetcher=None, max_entries=self.cache.max_entries)
+        return self._stores[directory]
+
+    @staticmethod
+    def source(history: pd.DataFrame) -> str:
+        # Changes with any new bar, update of the last bar or dividend correction
+        return f"{len(history)}|{history.index[-1].isoformat()}|{history.Close.iloc[-1]!r}|{history.Dividends.sum()!r}"
+
+    def dividend_model(self, ticker: str, history: pd.DataFrame) -> pd.DataFrame:
+        """Returns the dividend model of the full history of a ticker."""
+        with self._lock:
+            entry = self._models.get(ticker)
+            if entry is None:
+                entry = self._models[ticker] = [threading.Lock(), None]
+            self._models.move_to_end(ticker)
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+
+        # Other tickers are built concurrently
+        lock = entry[0]
+        with lock:
+            model = entry[1]
+            if model is not None and model.extends(history):
+                model.update(history)
+            else:
+                # Split adjusted or corrected histories start over
+                model = entry[1] = DividendModel(history)
+            return model.frame
+
+    def load(self, ticker: str, period: str) -> pd.DataFrame:
+        """Returns the yield bands of a ticker, computing them when outdated."""
+        history = self.cache.load(ticker, 'max')
+        if history.empty:
+            raise ValueError(f"No data found for {ticker}")
+        source = self.source(history)
+
+        with trace_stage('yield_bands', Period=period):
+            bands = self.store.read(ticker, period)
+            if bands is None or bands.attrs.get('Source') != source:
+                trace_note(Cache='miss')
+                dividends = None
+                if period == 'max':
+                    with trace_stage('dividend_model'):
+                        dividends = self.dividend_model(ticker, history)
+                bands = compute_yield_bands(slice_period(history, period), dividends)
+                bands.attrs['Source'] = source
+                self.store.put(ticker, period, bands)
+            else:
+                trace_note(Cache='hit')
+            trace_note(Rows=len(bands))
+        return bands
+
+yield_band_store = YieldBandStore()
+
+def warmup_tickers() -> list[str]:
+    """
+    Returns WARMUP_TICKERS, or the WARMUP_TOP_HOLDINGS US tickers with the
+    largest total weight in the stock universe.
+    """
+    if WARMUP_TICKERS:
+        return WARMUP_TICKERS
+    holdings = yahoo_holdings(load_holdings(UNIVERSE_PATH))
+    weights = holdings.groupby('Ticker')['Weight (%)'].sum()
+    return weights.nlargest(WARMUP_TOP_HOLDINGS).index.tolist()
+
+class WarmupScheduler:
+    """
+    Background thread keeping the histories and yield bands of popular
+    tickers warm, so interactive requests hit the stores.
+
+    Shortly after startup, histories missing or stale are loaded. Then every
+    weekday at `at`, after the market close, every history is refreshed
+    with its new bars and the yield bands of every period recomputed.
+
+    Parameters:
+    ----------
+    - tickers: list[str]
+        Tickers to keep warm, defaults to `warmup_tickers()`
+    - periods: list[str]
+        Periods of the yield bands to precompute
+    - at: datetime.time
+        Time of the daily refresh
+    - timezone: str
+        Timezone of `at`
+    - bands: YieldBandStore
+        Store to warm, defaults to the module-level `yield_band_store`
+    """
+    def __init__(
+        self,
+        tickers: list[str] | None = None,
+        periods: list[str] = WARMUP_PERIODS,
+        at: datetime.time = WARMUP_TIME,
+        timezone: str = WARMUP_TIMEZONE,
+        bands: YieldBandStore | None = None,
+    ):
+        self.tickers = tickers
+        self.periods = periods
+        self.at = at
+        self.timezone = zoneinfo.ZoneInfo(timezone)
+        self.bands = bands if bands is not None else yield_band_store
+        self.last_run = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def next_run(self, now: datetime.datetime) -> datetime.datetime:
+        """Returns the first weekday refresh time after `now` (timezone aware)."""
+        local = now.astimezone(self.timezone)
+        run = datetime.datetime.combine(local.date(), self.at, tzinfo=self.timezone)
+        if run <= local:
+            run += datetime.timedelta(days=1)
+        while run.weekday() >= 5:
+            run += datetime.timedelta(days=1)
+        return run
+
+    def warm(self, refresh: bool = True) -> dict:
+        """
+        Loads every ticker and precomputes its yield bands.
+
+        Parameters:
+        ----------
+        - refresh: bool
+            Download the new bars of every history, instead of only those
+            missing or stale
+
+        Returns:
+        -------
+        - dict mapping each failed ticker to its exception
+        """
+        tickers = self.tickers if self.tickers is not None else warmup_tickers()
+        start = time.monotonic()
+        errors = {}
+        for ticker in tickers:
+            if self._stop.is_set():
+                break
+            try:
+                if refresh:
+                    self.bands.cache.update(ticker)
+                for period in self.periods:
+                    self.bands.load(ticker, period)
+            except Exception as e:
+                errors[ticker] = e
+        self.last_run = datetime.datetime.now(self.timezone)
+        logger.info(
+            'warm-up of %d tickers done in %.0fs, %d failed',
+            len(tickers), time.monotonic() - start, len(errors)
+        )
+        return errors
+
+    def _run(self) -> None:
+        if self._stop.wait(WARMUP_STARTUP_DELAY):
+            return
+        self.warm(refresh=False)
+        while True:
+            now = datetime.datetime.now(self.timezone)
+            if self._stop.wait((self.next_run(now) - now).total_seconds()):
+                return
+            self.warm(refresh=True)
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='warmup-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+@st.cache_resource(show_spinner=False)
+def start_warmup_scheduler() -> WarmupScheduler | None:
+    """
+    Starts the warm-up scheduler once per process, unless disabled with
+    FINANCE_TOOLS_WARMUP=0.
+    """
+    if not WARMUP_ENABLED:
+        return None
+    scheduler = WarmupScheduler()
+    scheduler.start()
+    return scheduler
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Returns the positions of the points kept when reducing a series to
+    `n_out` points with the Largest-Triangle-Three-Buckets algorithm, which
+    preserves the visual shape (peaks and troughs) of the series.
+
+    Parameters:
+    ----------
+    - x: np.ndarray
+        Sorted x values
+    - y: np.ndarray
+        y values
+    - n_out: int
+        Number of points to keep, the first and last ones included
+
+    Returns:
+    -------
+    - np.ndarray of sorted positions
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # Middle points are split in n_out - 2 buckets, one point kept per bucket
+    edges = (np.arange(n_out - 1) * (n - 2) / (n_out - 2)).astype(int) + 1
+    edges[-1] = n - 1
+    # Bucket averages from cumulative sums, the last "bucket" is the last point
+    x_sum = np.concatenate([[0], np.cumsum(x)])
+    y_sum = np.concatenate([[0], np.cumsum(y)])
+    starts = edges[1:]
+    ends = np.append(edges[2:], n)
+    x_avg = (x_sum[ends] - x_sum[starts]) / (ends - starts)
+    y_avg = (y_sum[ends] - y_sum[starts]) / (ends - starts)
+
+    indices = np.empty(n_out, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Point of the bucket forming the largest triangle with the previous
+        # kept point and the average of the next bucket
+        areas = np.abs(
+            (x[a] - x_avg[i]) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (y_avg[i] - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
+
+def downsample_frame(frame: pd.DataFrame, max_points: int | None = CHART_MAX_POINTS, column: str = 'Close') -> pd.DataFrame:
+    """
+    Returns at most `max_points` rows of a dated frame for charting, chosen
+    on `column` with `lttb_indices`. All columns keep the selected rows.
+
+    Parameters:
+    ----------
+    - frame: pd.DataFrame
+        Frame with a Date column, sorted by date
+    - max_points: int
+        Maximum number of rows, None to keep them all
+    - column: str
+        Column whose shape is preserved
+
+    Returns:
+    -------
+    - pd.DataFrame
+    """
+    if max_points is None or len(frame) <= max_points:
+        return frame
+    x = frame.Date.to_numpy().astype('datetime64[s]').astype(float)
+    return frame.iloc[lttb_indices(x, frame[column].to_numpy(), max_points)].reset_index(drop=True)
+
+class DividendChartData(NamedTuple):
+    """Everything the dividend charts show for a ticker and a period."""
+    ticker: str
+    period: str
+    # Date, Close, YearlyDividends, DividendYield and Drawdown
+    frame: pd.DataFrame
+    quantiles: tuple
+    median_yield: float
+    yield_percentile: float
+    upside_downside: float
+
+@st.cache_data(ttl=CHART_CACHE_TTL, max_entries=CHART_CACHE_MAX_ENTRIES, show_spinner=False)
+def compute_dividend_chart_data(ticker: str, period: str) -> DividendChartData:
+    """
+    Returns the data of the dividend charts of a ticker.
+    Results are memoized across sessions, see CHART_CACHE_TTL and
+    CHART_CACHE_MAX_ENTRIES.
+
+    Parameters:
+    ----------
+    - ticker: str
+        Ticker from yahoo finance
+    - period: str
+        Period to collect data from (ytd, 1wk, 1m, 6m, 1y, 10y, ..., max)
+
+    Returns:
+    -------
+    - DividendChartData
+    """
+    # Only runs on misses of the Streamlit cache
+    trace_note(Cache='miss')
+    bands = yield_band_store.load(ticker, period)
+    stats = bands.attrs
+    frame = bands.copy()
+    frame.attrs = {}
+    return DividendChartData(
         ticker=ticker,
-        period=f"{int(period.split('y')[0])}y" if 'y' in period else period
+        period=period,
+        frame=frame,
+        quantiles=tuple(stats['Quantiles']),
+        median_yield=stats['MedianYield'],
+        yield_percentile=stats['YieldPercentile'],
+        upside_downside=stats['UpsideDownside'],
     )
 
-    dividends = process_dividend_history(history)
+def render_dividend_chart(data: DividendChartData, currency_symbol='$', max_points: int | None = CHART_MAX_POINTS):
+    """
+    Returns the price, dividend yield and drawdown charts of a ticker.
 
-    # Merge dividends with price history
-    df = pd.merge(
-        left=history.reset_index(),
-        right=dividends.drop(columns=['Dividends']),
-        on='Date',
-        how='left'
-    ).ffill(limit=300).fillna(0)
+    Parameters:
+    ----------
+    - data: DividendChartData
+        Output of `compute_dividend_chart_data`
+    - currency_symbol: str
+        Currency of the stock prices
+    - max_points: int
+        Maximum number of dates sent to the browser, None to send all
 
-    df['Drawdown'] = df.Close / df.Close.cummax() - 1
+    Returns:
+    -------
+    - price, dividend yield and drawdown charts
+    """
+    alt = setup_altair()
 
-    # Keep data from first dividend
-    index_first_dividend = df[df.YearlyDividends > 0].index[0]
-    df = df.loc[index_first_dividend:]
+    # Long histories are reduced to what the chart width can show, each line
+    # keeping the peaks and troughs of its own series
+    df = downsample_frame(data.frame, max_points)
+    yield_df = downsample_frame(data.frame, max_points, column='DividendYield')
+    drawdown_df = downsample_frame(data.frame, max_points, column='Drawdown')
+    trace_note(Points=len(df) + len(yield_df) + len(drawdown_df))
 
-    # Drop where dividends is null
-    df = df[df.YearlyDividends.notna()]
-    # Calculate dividend yield base on TTM distributions
-    df['DividendYield'] = df.YearlyDividends / df.Close
+    # Price at each yield decile: lowest yield first, i.e. highest price
+    quantiles = np.asarray(data.quantiles)
+    prices = df.YearlyDividends.to_numpy()[:, None] / quantiles
+    decile_names = [f"{decile * 10}%" for decile in range(len(quantiles))][::-1]
 
-    # Calculate quantiles of dividend yield
-    quantiles = df.DividendYield.quantile(q=np.arange(0, 1.1, .1))
-    yield_df = pd.DataFrame(df.YearlyDividends.to_numpy()[:, None] / quantiles.to_numpy(), index=df.Date)
-    yield_df.columns = [f"{decile * 10}%" for decile in yield_df.columns[::-1]]
-    yield_df = yield_df.reset_index()
+    # One row per date and band between two consecutive deciles, named after
+    # its upper decile, shared by every band of the chart
+    n_bands = len(quantiles) - 1
+    band_names = decile_names[:-1]
+    bands = pd.DataFrame({
+        'Date': np.repeat(df.Date.to_numpy(), n_bands),
+        'Band': np.tile(band_names, len(df)),
+        'Upper': prices[:, :-1].ravel(),
+        'Lower': prices[:, 1:].ravel(),
+    })
 
     # Set locale options
     if currency_symbol in ['€', 'CHF']:
@@ -251,53 +2156,50 @@ def generate_dividend_chart(ticker, period, currency_symbol='$'):
         )
 
     # Create color palette and scale for legend
-    palette = sns.color_palette("vlag_r", len(quantiles)-1).as_hex()
-    scale = alt.Scale(domain=yield_df.columns[1:-1].tolist(), range=palette)
+    palette = YIELD_BAND_PALETTE[:n_bands]
+    scale = alt.Scale(domain=band_names, range=palette)
 
 
-    upside_downside = df.DividendYield.iloc[-1] / df.DividendYield.quantile(q=0.5)
+    upside_downside = data.upside_downside
     if upside_downside > 1: 
         upside_downside_str = f'{upside_downside - 1: .0%} upside to median yield (~{currency_symbol}{upside_downside * df.Close.iloc[-1]:.0f}).'
     else:
         upside_downside_str = f'{upside_downside - 1: .0%} downside to median yield (~{currency_symbol}{upside_downside * df.Close.iloc[-1]:.0f}).'
 
-    # Create layers for chart
-    def make_layer(yield_df, col1, col2):
-        return alt.Chart(yield_df.assign(color=col1)).mark_area().encode(
-            x=alt.X(
-                'Date:T',
-                title='',
-                axis=alt.Axis(format='%Y', tickCount='year')
-            ),
-        ).encode(
-            y=alt.Y(
-                f"{col1}:Q",
-                title=f'Price: {upside_downside_str}',
-                axis=alt.Axis(format='$.0f'),
-                scale=alt.Scale(zero=False, domain=[df.Close.min()*0.9, df.Close.max()*1.15], clamp=True),
-            ),
-            y2=alt.Y2(
-                f"{col2}:Q",
-            ),
-            color=alt.Color(
-                f"color:N",
-                title='Yield percentile',
-                scale=scale,
-                legend=None,
-                # legend=alt.Legend(
-                #     legendX=465,
-                #     legendY=-25,
-                #     orient='none',
-                #     direction='horizontal',
-                # )
-            ),
-            opacity=alt.value(0.75),
-            tooltip=alt.value(None)
-        )
+    # Create layers for chart, a single area mark draws one area per band
+    bands_chart = alt.Chart(bands).mark_area().encode(
+        x=alt.X(
+            'Date:T',
+            title='',
+            axis=alt.Axis(format='%Y', tickCount='year')
+        ),
+        y=alt.Y(
+            "Upper:Q",
+            title=f'Price: {upside_downside_str}',
+            axis=alt.Axis(format='$.0f'),
+            scale=alt.Scale(zero=False, domain=[data.frame.Close.min()*0.9, data.frame.Close.max()*1.15], clamp=True),
+            stack=None,
+        ),
+        y2=alt.Y2(
+            "Lower:Q",
+        ),
+        color=alt.Color(
+            "Band:N",
+            title='Yield percentile',
+            scale=scale,
+            legend=None,
+            # legend=alt.Legend(
+            #     legendX=465,
+            #     legendY=-25,
+            #     orient='none',
+            #     direction='horizontal',
+            # )
+        ),
+        opacity=alt.value(0.75),
+        tooltip=alt.value(None)
+    )
 
-    layers=[]
-    for col1, col2 in zip(yield_df.columns[1:-1], yield_df.columns[2:]):
-        layers.append(make_layer(yield_df, col1, col2))
+    layers=[bands_chart]
 
     price = alt.Chart(df).mark_line(color="white").encode(
         x=alt.X(
@@ -329,31 +2231,31 @@ def generate_dividend_chart(ticker, period, currency_symbol='$'):
     )
     layers.append(price_text)
 
-    yield_chart = price.encode(
+    yield_chart = price.properties(data=yield_df).encode(
         y=alt.Y(
             'DividendYield:Q',
             axis=alt.Axis(format='.1%',),
             scale=alt.Scale(zero=False),
-            title=f'Dividend yield: higher than {df.DividendYield.rank(pct=True).iloc[-1]:.0%} of the period (median {df.DividendYield.quantile(q=0.5):.2%}).',
+            title=f'Dividend yield: higher than {data.yield_percentile:.0%} of the period (median {data.median_yield:.2%}).',
         ),
         tooltip=alt.value(None)
     )
-    median_yield = price.mark_rule(
+    # Median over the full history, not the downsampled points
+    median_yield = alt.Chart(pd.DataFrame({'DividendYield': [data.median_yield]})).mark_rule(
         color='white',
         strokeDash=[16, 16],
         strokeWidth=.5
         # opacity=.5,
     ).encode(
-        x=alt.X(),
-        y='median(DividendYield):Q'
+        y=alt.Y('DividendYield:Q', axis=None, scale=alt.Scale(zero=False))
     )
-     
+
     yield_text = price_text.encode(
-        y=alt.Y('DividendYield:Q', scale=alt.Scale(zero=False)),
+        y=alt.Y('DividendYield:Q', axis=None, scale=alt.Scale(zero=False)),
         text=alt.Text('DividendYield:Q', format='.1%')
     )
 
-    drawdown_chart = price.encode(
+    drawdown_chart = price.properties(data=drawdown_df).encode(
         x=alt.X(
             'Date:T',
             title='',
@@ -373,52 +2275,486 @@ def generate_dividend_chart(ticker, period, currency_symbol='$'):
         tooltip=alt.value(None)
     )
     drawdown_text = price_text.encode(
-        y=alt.Y('Drawdown:Q', scale=alt.Scale(zero=False)),
+        y=alt.Y('Drawdown:Q', axis=None, scale=alt.Scale(zero=False)),
         text=alt.Text('Drawdown:Q', format='.0%')
     )
 
-    percentile = int((1 - df.DividendYield.rank(pct=True).iloc[-1]) * 100)
-    def format_percentile(percentile):
-        if (4 <= percentile <= 20) or (percentile % 10 not in [1, 2, 3]):
-            return str(percentile) + 'th'
-        if percentile % 10 == 1:
-            return str(percentile) + 'st'
-        if percentile % 10 == 2:
-            return str(percentile) + 'nd'
-        if percentile % 10 == 3:
-            return str(percentile) + 'rd'
-            
-    percentile_string = format_percentile(percentile)
-
     price_chart = alt.layer(*layers).properties(
         width=1200,
         height=400,
-        # title=f"""{ticker} {period} Chart • Price: ${
-        #             df.iloc[-1].Close:.2f} • Yield: {
-        #             df.iloc[-1].DividendYield:.2%} ({
-        #             percentile_string} percentile) • Drawdown: {
-        #                 df.Drawdown.iloc[-1]:.0%}""",
     )
-    yield_chart = yield_chart.properties(
+    yield_chart = (yield_chart + yield_text + median_yield).properties(
         width=1200,
         height=300
     )
-    drawdown_chart = drawdown_chart.properties(
+    drawdown_chart = (drawdown_chart + drawdown_text).properties(
         width=1200,
         height=300
     )
 
-    chart = alt.vconcat(
-        price_chart,
-        (yield_chart + yield_text + median_yield),
-        (drawdown_chart + drawdown_text),
-        spacing=0
-    )
-    chart = chart.properties(
-        title=f"""Ticker: {ticker}  •  Period: {df.Date.dt.year.max() - df.Date.dt.year.min() + 1}y"""
+    return price_chart, yield_chart, drawdown_chart
+
+def generate_dividend_chart(ticker, period, currency_symbol='$'):
+    with trace_stage('chart_data', Cache='hit'):
+        data = compute_dividend_chart_data(ticker.strip().upper(), period)
+    with trace_stage('render_charts', Rows=len(data.frame)):
+        return render_dividend_chart(data, currency_symbol)
+
+RETURN_METRICS = ['PriceReturn', 'TotalReturn', 'PriceDrawdown', 'TotalDrawdown', 'CumulativeShares']
+
+def compute_returns(panel: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the daily returns and drawdowns of many tickers, computed as
+    column operations over the whole panel.
+
+    Prices are aligned by date. A ticker missing a date traded by another
+    (holidays, different exchange calendars) carries its last price, and
+    each ticker is measured from its first available date.
+
+    Parameters:
+    ----------
+    - panel: pd.DataFrame
+        Histories with (ticker, field) columns, as returned by `load_many`,
+        with at least Close, Adj Close and Dividends fields
+
+    Returns:
+    -------
+    - pd.DataFrame indexed by date with (ticker, metric) columns, metrics
+      being PriceReturn, TotalReturn, PriceDrawdown, TotalDrawdown and
+      CumulativeShares (share count growth when reinvesting dividends)
+    """
+    tickers = panel.columns.get_level_values('Ticker').unique()
+
+    def field(name):
+        return panel.xs(name, axis=1, level='Field').reindex(columns=tickers)
+
+    close = field('Close').ffill().to_numpy(dtype=float)
+    adj_close = field('Adj Close').ffill().to_numpy(dtype=float)
+    dividends = field('Dividends').fillna(0).to_numpy(dtype=float)
+
+    # First available price of each ticker
+    first = np.argmax(~np.isnan(close), axis=0)
+    columns = np.arange(len(tickers))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        metrics = np.stack([
+            close / close[first, columns] - 1,
+            adj_close / adj_close[first, columns] - 1,
+            close / np.fmax.accumulate(close, axis=0) - 1,
+            adj_close / np.fmax.accumulate(adj_close, axis=0) - 1,
+            np.cumprod(1 + np.nan_to_num(dividends / close), axis=0),
+        ], axis=2)
+
+    return pd.DataFrame(
+        metrics.reshape(len(panel), -1),
+        index=panel.index,
+        columns=pd.MultiIndex.from_product([tickers, RETURN_METRICS], names=['Ticker', 'Metric'])
     )
-    chart = chart.configure(
-        font='Lato'
+
+def summarize_returns(returns: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the full-period statistics of the output of `compute_returns`.
+
+    Parameters:
+    ----------
+    - returns: pd.DataFrame
+        Daily returns with (ticker, metric) columns
+
+    Returns:
+    -------
+    - pd.DataFrame indexed by Ticker with PriceReturn, TotalReturn, Years,
+      CAGR (annualized total return), MaxDrawdown, CurrentDrawdown and
+      ShareGrowth
+    """
+    def metric(name):
+        return returns.xs(name, axis=1, level='Metric')
+
+    total_return = metric('TotalReturn')
+    first = np.argmax(total_return.notna().to_numpy(), axis=0)
+    years = (returns.index[-1] - returns.index[first]) / datetime.timedelta(365.2425)
+
+    summary = pd.DataFrame({
+        'PriceReturn': metric('PriceReturn').iloc[-1],
+        'TotalReturn': total_return.iloc[-1],
+        'Years': np.asarray(years),
+        'MaxDrawdown': metric('TotalDrawdown').min(),
+        'CurrentDrawdown': metric('TotalDrawdown').iloc[-1],
+        'ShareGrowth': metric('CumulativeShares').iloc[-1] - 1,
+    })
+    with np.errstate(invalid='ignore', divide='ignore'):
+        summary.insert(3, 'CAGR', (1 + summary.TotalReturn) ** (1 / summary.Years) - 1)
+    return summary
+
+TRADING_DAYS_PER_YEAR = 252
+
+def window_max_drawdown(values: np.ndarray, length: int) -> np.ndarray:
+    """
+    Returns the max drawdown of every window of `length` consecutive prices.
+
+    The series is cut in blocks of `length` prices, so any window is the
+    suffix of a block followed by the prefix of the next one. Its max
+    drawdown is the worst of the suffix's, the prefix's, and the prefix low
+    against the suffix high, all obtained from cumulative min/max scans of
+    the blocks: the cost is linear in the series length whatever the window.
+
+    Parameters:
+    ----------
+    - values: np.ndarray
+        Positive prices
+    - length: int
+        Number of prices per window
+
+    Returns:
+    -------
+    - np.ndarray of len(values) - length + 1 drawdowns, one per window start
+    """
+    n = len(values)
+    n_blocks = -(-n // length)
+    # Pad with the last price up to whole blocks, it adds no drawdown
+    x = np.log(np.concatenate([values, np.full(n_blocks * length - n, values[-1])]))
+    x = x.reshape(n_blocks, length)
+    reverse = x[:, ::-1]
+
+    prefix_min = np.minimum.accumulate(x, axis=1).ravel()
+    prefix_drawdown = np.minimum.accumulate(x - np.maximum.accumulate(x, axis=1), axis=1).ravel()
+    suffix_max = np.maximum.accumulate(reverse, axis=1)[:, ::-1].ravel()
+    suffix_min = np.minimum.accumulate(reverse, axis=1)[:, ::-1]
+    suffix_drawdown = np.minimum.accumulate((suffix_min - x)[:, ::-1], axis=1)[:, ::-1].ravel()
+
+    starts = np.arange(n - length + 1)
+    ends = starts + length - 1
+    drawdown = np.minimum(
+        np.minimum(suffix_drawdown[starts], prefix_drawdown[ends]),
+        prefix_min[ends] - suffix_max[starts]
     )
-    
-    return price_chart, yield_chart, drawdown_chart
+    # Windows aligned on a block are that whole block
+    drawdown = np.where(starts % length == 0, prefix_drawdown[ends], drawdown)
+    return np.exp(drawdown) - 1
+
+def rolling_returns(prices: pd.Series, years: float) -> pd.DataFrame:
+    """
+    Returns the outcome of holding a stock for `years` years, for every
+    possible start date. Windows are counted in trading days
+    (TRADING_DAYS_PER_YEAR per year).
+
+    Parameters:
+    ----------
+    - prices: pd.Series
+        Prices indexed by date, use adjusted closes for total returns
+    - years: float
+        Holding period
+
+    Returns:
+    -------
+    - pd.DataFrame indexed by start date with the CAGR and the MaxDrawdown
+      of each holding period
+    """
+    prices = prices.dropna()
+    values = prices.to_numpy(dtype=float)
+    window = int(round(years * TRADING_DAYS_PER_YEAR))
+    if window < 1 or len(values) <= window:
+        return pd.DataFrame(columns=['CAGR', 'MaxDrawdown'], index=prices.index[:0], dtype=float)
+
+    return pd.DataFrame({
+        'CAGR': (values[window:] / values[:-window]) ** (1 / years) - 1,
+        'MaxDrawdown': window_max_drawdown(values, window + 1),
+    }, index=prices.index[:-window])
+
+def drawdown_episodes(prices: pd.Series) -> pd.DataFrame:
+    """
+    Returns every drawdown of a stock, from a high to the next one.
+
+    Parameters:
+    ----------
+    - prices: pd.Series
+        Prices indexed by date, use adjusted closes for total returns
+
+    Returns:
+    -------
+    - pd.DataFrame with one row per drawdown: Peak, Trough and Recovery
+      dates (NaT while not recovered), Depth, DaysToTrough and
+      DaysToRecovery (calendar days from peak to recovery)
+    """
+    prices = prices.dropna()
+    values = prices.to_numpy(dtype=float)
+    dates = prices.index
+    columns = ['Peak', 'Trough', 'Recovery', 'Depth', 'DaysToTrough', 'DaysToRecovery']
+
+    at_high = values >= np.maximum.accumulate(values)
+    in_drawdown = ~at_high
+    if not in_drawdown.any():
+        return pd.DataFrame(columns=columns)
+
+    # Each drawdown belongs to the last high before it
+    highs = np.flatnonzero(at_high)
+    episode = np.cumsum(at_high)[in_drawdown] - 1
+    positions = np.flatnonzero(in_drawdown)
+    drawdown = values[in_drawdown] / values[highs[episode]] - 1
+
+    # Deepest point of each episode: first row of each episode once sorted by depth
+    order = np.lexsort((drawdown, episode))
+    episodes, first = np.unique(episode[order], return_index=True)
+    troughs = positions[order[first]]
+
+    peaks = highs[episodes]
+    recovered = episodes + 1 < len(highs)
+    recoveries = np.where(recovered, highs[np.minimum(episodes + 1, len(highs) - 1)], -1)
+
+    recovery_dates = pd.Series(dates[recoveries]).where(recovered)
+    result = pd.DataFrame({
+        'Peak': dates[peaks],
+        'Trough': dates[troughs],
+        'Recovery': recovery_dates.to_numpy(),
+        'Depth': drawdown[order[first]],
+    })
+    result['DaysToTrough'] = (result.Trough - result.Peak).dt.days
+    result['DaysToRecovery'] = (result.Recovery - result.Peak).dt.days
+    return result
+
+# Columns identifying a holding across funds and individual positions
+HOLDING_COLUMNS = ['Ticker', 'Name', 'Sector', 'Asset Class', 'Location']
+
+class LookThrough:
+    """
+    Look-through exposure of portfolios mixing funds and individual stocks.
+
+    Fund compositions are stored once as a sparse holdings-by-position
+    matrix (one entry per fund holding, individual stocks being positions
+    holding themselves at 100%). The exposure of a portfolio is then the
+    product of that matrix by its position values, whatever the number of
+    funds held.
+
+    Parameters:
+    ----------
+    - fund_holdings: pd.DataFrame
+        One row per fund holding, with Fund, Weight (%) and HOLDING_COLUMNS
+    - stocks: pd.DataFrame
+        Stocks that can be held directly, with HOLDING_COLUMNS
+    """
+    def __init__(self, fund_holdings: pd.DataFrame, stocks: pd.DataFrame | None = None):
+        frames = [fund_holdings.assign(Position='fund:' + fund_holdings.Fund.astype(str))]
+        if stocks is not None:
+            stocks = stocks.drop_duplicates(subset='Name')
+            frames.append(stocks.assign(Position='stock:' + stocks.Name.astype(str), **{'Weight (%)': 100.0}))
+        rows = pd.concat([frame[['Position', 'Weight (%)', *HOLDING_COLUMNS]] for frame in frames], ignore_index=True)
+
+        position_codes, self.positions = pd.factorize(rows.Position)
+        holding_codes, holdings = pd.factorize(pd.MultiIndex.from_frame(rows[HOLDING_COLUMNS]))
+        self.holdings = holdings.set_names(HOLDING_COLUMNS).to_frame(index=False)
+
+        # Matrix entries in coordinate format
+        self._rows = holding_codes
+        self._columns = position_codes
+        self._weights = rows['Weight (%)'].to_numpy(dtype=float) / 100
+
+    def position_vector(self, fund_positions: dict | None = None, stock_positions: dict | None = None) -> np.ndarray:
+        """Returns the value held in each position, unknown names are ignored."""
+        vector = np.zeros(len(self.positions))
+        for prefix, positions in (('fund:', fund_positions), ('stock:', stock_positions)):
+            if positions:
+                codes = self.positions.get_indexer([prefix + str(name) for name in positions])
+                values = np.fromiter(positions.values(), dtype=float, count=len(positions))
+                vector[codes[codes >= 0]] = values[codes >= 0]
+        return vector
+
+    def exposure(self, fund_positions: dict | None = None, stock_positions: dict | None = None) -> pd.DataFrame:
+        """
+        Returns the holdings of a portfolio, funds being looked through.
+
+        Parameters:
+        ----------
+        - fund_positions: dict
+            Value held in each fund, by fund name
+        - stock_positions: dict
+            Value held in each stock, by stock name
+
+        Returns:
+        -------
+        - pd.DataFrame with HOLDING_COLUMNS, Value and Weight (%), one row per
+          holding, by decreasing value
+        """
+        vector = self.position_vector(fund_positions, stock_positions)
+        values = np.bincount(
+            self._rows,
+            weights=self._weights * vector[self._columns],
+            minlength=len(self.holdings)
+        )
+        held = values != 0
+        holdings = self.holdings.loc[held].assign(Value=values[held])
+        holdings['Weight (%)'] = holdings.Value / holdings.Value.sum() * 100
+        return holdings.sort_values(by='Value', ascending=False).reset_index(drop=True)
+
+def exposure_breakdown(holdings: pd.DataFrame, by: str) -> pd.DataFrame:
+    """
+    Returns the Value and Weight (%) of holdings summed by Sector,
+    Location, Asset Class or any other holding column.
+    """
+    return holdings.groupby(by, observed=True)[['Value', 'Weight (%)']].sum()
+
+class PortfolioStore:
+    """
+    SQLite store of saved portfolios, with a versioned snapshot per save.
+
+    Each snapshot holds the fund and stock positions of a portfolio and,
+    optionally, its look-through exposure (see `LookThrough.exposure`)
+    computed when saved. Portfolios are namespaced by an owner id, e.g. the
+    id kept in a browser cookie.
+
+    Portfolios are dicts of {'etf_holdings': {fund: value}, 'stock_holdings': {stock: value}}.
+
+    Parameters:
+    ----------
+    - path: str
+        Path of the SQLite database, created when missing. Set
+        FINANCE_TOOLS_PORTFOLIO_DB to a persistent volume when the app's
+        local disk is not, or portfolios are lost on restarts
+    """
+    POSITION_KINDS = {'etf_holdings': 'fund', 'stock_holdings': 'stock'}
+
+    def __init__(self, path: str = PORTFOLIO_DB_PATH):
+        self.path = path
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.execute('PRAGMA foreign_keys = ON')
+        if not self._initialized:
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS portfolios (
+                    id INTEGER PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    UNIQUE (owner, name)
+                );
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    portfolio_id INTEGER NOT NULL REFERENCES portfolios (id) ON DELETE CASCADE,
+                    version INTEGER NOT NULL,
+                    saved_at TEXT NOT NULL,
+                    exposure BLOB,
+                    PRIMARY KEY (portfolio_id, version)
+                );
+                CREATE TABLE IF NOT EXISTS positions (
+                    portfolio_id INTEGER NOT NULL,
+                    version INTEGER NOT NULL,
+                    kind TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    value REAL NOT NULL,
+                    PRIMARY KEY (portfolio_id, version, kind, name),
+                    FOREIGN KEY (portfolio_id, version) REFERENCES snapshots (portfolio_id, version) ON DELETE CASCADE
+                );
+            """)
+            self._initialized = True
+        return connection
+
+    def _snapshot(self, connection: sqlite3.Connection, owner: str, name: str, version: int | None) -> tuple[int, int] | None:
+        row = connection.execute(
+            'SELECT id, version FROM portfolios WHERE owner = ? AND name = ?', (owner, name)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1] if version is None else version
+
+    def names(self, owner: str) -> list[str]:
+        """Returns the names of the portfolios of an owner."""
+        with closing(self._connect()) as connection:
+            rows = connection.execute('SELECT name FROM portfolios WHERE owner = ? ORDER BY name', (owner,))
+            return [name for name, in rows]
+
+    def versions(self, owner: str, name: str) -> pd.DataFrame:
+        """Returns the Version, SavedAt date and total Value of the snapshots of a portfolio, latest first."""
+        with closing(self._connect()) as connection:
+            return pd.read_sql_query("""
+                SELECT s.version AS Version, s.saved_at AS SavedAt, COALESCE(SUM(p.value), 0) AS Value
+                FROM portfolios f
+                JOIN snapshots s ON s.portfolio_id = f.id
+                LEFT JOIN positions p ON p.portfolio_id = s.portfolio_id AND p.version = s.version
+                WHERE f.owner = ? AND f.name = ?
+                GROUP BY s.version ORDER BY s.version DESC
+            """, connection, params=(owner, name), parse_dates=['SavedAt'])
+
+    def load(self, owner: str, name: str, version: int | None = None) -> dict | None:
+        """Returns the positions of a portfolio, latest version by default, or None if absent."""
+        with closing(self._connect()) as connection:
+            snapshot = self._snapshot(connection, owner, name, version)
+            if snapshot is None:
+                return None
+            rows = connection.execute(
+                'SELECT kind, name, value FROM positions WHERE portfolio_id = ? AND version = ? ORDER BY rowid',
+                snapshot
+            ).fetchall()
+        portfolio = {key: {} for key in self.POSITION_KINDS}
+        keys = {kind: key for key, kind in self.POSITION_KINDS.items()}
+        for kind, position, value in rows:
+            portfolio[keys[kind]][position] = value
+        return portfolio
+
+    def exposure(self, owner: str, name: str, version: int | None = None) -> pd.DataFrame | None:
+        """Returns the exposure stored with a portfolio snapshot, or None if absent."""
+        with closing(self._connect()) as connection:
+            snapshot = self._snapshot(connection, owner, name, version)
+            if snapshot is None:
+                return None
+            row = connection.execute(
+                'SELECT exposure FROM snapshots WHERE portfolio_id = ? AND version = ?', snapshot
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return pd.read_parquet(io.BytesIO(row[0]))
+
+    def save(self, owner: str, name: str, portfolio: dict, exposure: pd.DataFrame | None = None) -> int:
+        """
+        Saves a new version of a portfolio.
+
+        Parameters:
+        ----------
+        - owner: str
+            Owner id
+        - name: str
+            Portfolio name
+        - portfolio: dict
+            Fund and stock positions
+        - exposure: pd.DataFrame
+            Look-through exposure of the positions, stored with them
+
+        Returns:
+        -------
+        - int version saved
+        """
+        blob = None
+        if exposure is not None:
+            buffer = io.BytesIO()
+            exposure.to_parquet(buffer, index=False)
+            blob = buffer.getvalue()
+        positions = [
+            (kind, position, float(value))
+            for key, kind in self.POSITION_KINDS.items()
+            for position, value in portfolio.get(key, {}).items()
+        ]
+
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                'INSERT INTO portfolios (owner, name, version) VALUES (?, ?, 1) '
+                'ON CONFLICT (owner, name) DO UPDATE SET version = version + 1',
+                (owner, name)
+            )
+            portfolio_id, version = self._snapshot(connection, owner, name, None)
+            connection.execute(
+                'INSERT INTO snapshots VALUES (?, ?, ?, ?)',
+                (portfolio_id, version, datetime.datetime.now().isoformat(timespec='seconds'), blob)
+            )
+            connection.executemany(
+                'INSERT INTO positions VALUES (?, ?, ?, ?, ?)',
+                [(portfolio_id, version, *position) for position in positions]
+            )
+        return version
+
+    def delete(self, owner: str, name: str) -> None:
+        """Deletes a portfolio and all its versions."""
+        with closing(self._connect()) as connection, connection:
+            connection.execute('DELETE FROM portfolios WHERE owner = ? AND name = ?', (owner, name))
+
+portfolio_store = PortfolioStore()